@@ -21,11 +21,24 @@ Example:
 """
 import hashlib
 import os
+import secrets
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
-import ecdsa
-import base58
+try:
+    # based58 (Rust) - Base58Check (checksum + encode) chạy trong native code
+    from based58 import b58encode_check as _b58encode_check
+except ImportError:
+    from base58 import b58encode_check as _b58encode_check
+
+try:
+    # libsecp256k1 (C) - nhanh hơn ~100x so với ecdsa thuần Python
+    from coincurve import PrivateKey
+except ImportError:
+    PrivateKey = None
+    import ecdsa
+
+from client.hashing import hash160 as _hash160
 
 
 # =============================================================================
@@ -45,6 +58,66 @@ MAINNET_VERSION = b'\x00'
 # Testnet version byte
 TESTNET_VERSION = b'\x6f'
 
+# Wallet encryption (scrypt KDF)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Legacy wallet encryption (pbkdf2_xor)
+PBKDF2_ITERATIONS = 100000
+
+
+# =============================================================================
+# ADDRESS DERIVATION
+# =============================================================================
+
+def _hash160_to_address(pubkey_hash: bytes, version: bytes) -> str:
+    """Base58Check(version + pubkey_hash + checksum)."""
+    # Checksum = 4 bytes đầu của double SHA256, tính luôn trong b58encode_check
+    return _b58encode_check(version + pubkey_hash).decode('utf-8')
+
+
+def derive_address(public_key: bytes, version: bytes = MAINNET_VERSION) -> str:
+    """
+    Derive P2PKH address từ public key mà không cần tạo Account.
+    
+    Dùng khi chỉ cần address (vd. hiển thị, build script), tránh chi phí
+    khởi tạo object + derive lại public key.
+    """
+    return _hash160_to_address(_hash160(public_key), version)
+
+
+# =============================================================================
+# WALLET ENCRYPTION HELPERS
+# =============================================================================
+
+def _scrypt_key(password: str, salt: bytes, n: int = SCRYPT_N,
+                r: int = SCRYPT_R, p: int = SCRYPT_P) -> bytes:
+    """Derive 32-byte key từ password bằng scrypt (memory-hard)."""
+    return hashlib.scrypt(
+        password.encode('utf-8'), salt=salt, n=n, r=r, p=p, dklen=32
+    )
+
+
+def _aesgcm(key: bytes):
+    """Tạo AES-GCM cipher (import lazy để account.py không bắt buộc cryptography)."""
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    return AESGCM(key)
+
+
+def _aesgcm_decrypt(key: bytes, nonce: bytes, data: bytes) -> bytes:
+    """
+    Giải mã AES-GCM. Chỉ lỗi xác thực tag (sai password / file bị sửa) mới
+    thành ValueError; lỗi khác (nonce sai độ dài, thiếu cryptography) giữ
+    nguyên để không bị che thành "sai password".
+    """
+    from cryptography.exceptions import InvalidTag
+    cipher = _aesgcm(key)
+    try:
+        return cipher.decrypt(nonce, data, None)
+    except InvalidTag:
+        raise ValueError("Wrong password or corrupted wallet file") from None
+
 
 # =============================================================================
 # ACCOUNT CLASS
@@ -77,7 +150,9 @@ class Account:
         keys = account.create_keys()
     """
     
-    __slots__ = ['private_key', 'public_key', 'address', '_version']
+    __slots__ = [
+        'private_key', 'public_key', 'address', '_version', '_pubkey_hash'
+    ]
     
     def __init__(self, private_key: Optional[str] = None, testnet: bool = False):
         """
@@ -92,6 +167,7 @@ class Account:
         self.public_key: Optional[bytes] = None
         self.address: Optional[str] = None
         self._version = TESTNET_VERSION if testnet else MAINNET_VERSION
+        self._pubkey_hash: Optional[bytes] = None
         
         # Import private key nếu có
         if private_key:
@@ -130,11 +206,32 @@ class Account:
         logger.info(f"Account created: {self.address}")
         
         return {
-            'private_key': self.private_key.hex(),
-            'public_key': self.public_key.hex(),
+            'private_key': self.get_private_key(),
+            'public_key': self.get_public_key(),
             'address': self.address
         }
     
+    @classmethod
+    def generate_batch(cls, n: int, testnet: bool = False) -> List['Account']:
+        """
+        Tạo nhiều account, lấy entropy cho cả batch trong một lần
+        (secrets.token_bytes(32 * n)) thay vì một syscall mỗi key.
+        
+        Args:
+            n: Số account cần tạo
+            testnet: Sử dụng testnet format
+            
+        Returns:
+            list: Các Account đã có đủ keypair + address
+        """
+        buf = secrets.token_bytes(32 * n)
+        accounts = []
+        for i in range(n):
+            account = cls(private_key=buf[i * 32:(i + 1) * 32], testnet=testnet)
+            account.create_keys()
+            accounts.append(account)
+        return accounts
+    
     def _generate_private_key(self) -> bytes:
         """
         Generate private key ngẫu nhiên.
@@ -150,7 +247,8 @@ class Account:
         """
         Derive public key từ private key.
         
-        Sử dụng ECDSA với curve secp256k1 (chuẩn Bitcoin).
+        Sử dụng ECDSA với curve secp256k1 (chuẩn Bitcoin): coincurve
+        (libsecp256k1) nếu đã cài, ngược lại fallback sang ecdsa.
         Trả về compressed public key (33 bytes).
         
         Compressed format:
@@ -161,26 +259,18 @@ class Account:
         Returns:
             bytes: Compressed public key (33 bytes)
         """
-        # Tạo signing key từ private key
+        if PrivateKey is not None:
+            # libsecp256k1 trả về trực tiếp dạng compressed
+            return PrivateKey(self.private_key).public_key.format(compressed=True)
+        
+        # Fallback: tạo signing key từ private key
         signing_key = ecdsa.SigningKey.from_string(
             self.private_key, 
             curve=ecdsa.SECP256k1
         )
         
-        # Get verifying key (public key)
-        verifying_key = signing_key.get_verifying_key()
-        
-        # Get raw public key point (x, y)
-        # verifying_key.to_string() returns x || y (64 bytes)
-        raw_pubkey = verifying_key.to_string()
-        x = raw_pubkey[:32]
-        y = raw_pubkey[32:]
-        
-        # Compress: prefix + x
-        # Prefix: 0x02 if y is even, 0x03 if y is odd
-        prefix = b'\x02' if y[-1] % 2 == 0 else b'\x03'
-        
-        return prefix + x
+        # Compressed encoding (prefix 0x02/0x03 + x) do thư viện tự tính parity
+        return signing_key.get_verifying_key().to_string('compressed')
     
     # =========================================================================
     # ADDRESS GENERATION
@@ -200,25 +290,11 @@ class Account:
         Returns:
             str: Bitcoin address
         """
-        # Step 1: SHA256
-        sha256_hash = hashlib.sha256(self.public_key).digest()
+        # Step 1 + 2: pubkey_hash - cache lại cho get_pubkey_hash
+        self._pubkey_hash = _hash160(self.public_key)
         
-        # Step 2: RIPEMD160
-        ripemd160_hash = hashlib.new('ripemd160', sha256_hash).digest()
-        
-        # Step 3: Add version byte
-        versioned = self._version + ripemd160_hash
-        
-        # Step 4: Calculate checksum (first 4 bytes of double SHA256)
-        checksum = hashlib.sha256(
-            hashlib.sha256(versioned).digest()
-        ).digest()[:4]
-        
-        # Step 5: Base58 encode
-        binary_address = versioned + checksum
-        address = base58.b58encode(binary_address).decode('utf-8')
-        
-        return address
+        # Step 3 - 5: version + hash + checksum -> Base58
+        return _hash160_to_address(self._pubkey_hash, self._version)
     
     # =========================================================================
     # GETTERS
@@ -249,9 +325,10 @@ class Account:
         if not self.public_key:
             return None
         
-        sha256_hash = hashlib.sha256(self.public_key).digest()
-        ripemd160_hash = hashlib.new('ripemd160', sha256_hash).digest()
-        return ripemd160_hash.hex()
+        # Public key được set trực tiếp (vd. load_from_file) -> tính lazy một lần
+        if self._pubkey_hash is None:
+            self._pubkey_hash = _hash160(self.public_key)
+        return self._pubkey_hash.hex()
     
     # =========================================================================
     # UTILITY METHODS
@@ -269,32 +346,29 @@ class Account:
         
         data = {
             'address': self.address,
-            'public_key': self.public_key.hex() if self.public_key else None
+            'public_key': self.get_public_key()
         }
         
         if self.private_key:
             if password:
-                # Encrypt private key using simple XOR with PBKDF2 derived key
+                # Encrypt private key: scrypt KDF + AES-GCM (authenticated)
                 salt = os.urandom(16)
-                key = hashlib.pbkdf2_hmac(
-                    'sha256', 
-                    password.encode('utf-8'), 
-                    salt, 
-                    100000,
-                    dklen=32
-                )
-                
-                # XOR
-                encrypted_key = bytes(a ^ b for a, b in zip(self.private_key, key))
+                nonce = os.urandom(12)
+                key = _scrypt_key(password, salt)
+                encrypted_key = _aesgcm(key).encrypt(nonce, self.private_key, None)
                 
                 data['encryption'] = {
-                    'method': 'pbkdf2_xor',
+                    'method': 'scrypt_aesgcm',
+                    'n': SCRYPT_N,
+                    'r': SCRYPT_R,
+                    'p': SCRYPT_P,
                     'salt': salt.hex(),
+                    'nonce': nonce.hex(),
                     'encrypted_privkey': encrypted_key.hex()
                 }
             else:
                 # Plain text (Warning: Unsafe)
-                data['private_key'] = self.private_key.hex()
+                data['private_key'] = self.get_private_key()
                 
         try:
             with open(filepath, 'w') as f:
@@ -325,23 +399,36 @@ class Account:
                 raise ValueError("Password required to decrypt wallet")
                 
             enc_data = data['encryption']
-            if enc_data['method'] != 'pbkdf2_xor':
-                raise ValueError("Unsupported encryption method")
-                
+            method = enc_data.get('method')
             salt = bytes.fromhex(enc_data['salt'])
             encrypted_key = bytes.fromhex(enc_data['encrypted_privkey'])
             
-            # Derive key again
-            key = hashlib.pbkdf2_hmac(
-                'sha256', 
-                password.encode('utf-8'), 
-                salt, 
-                100000,
-                dklen=32
-            )
-            
-            # XOR to decrypt
-            account.private_key = bytes(a ^ b for a, b in zip(encrypted_key, key))
+            if method == 'scrypt_aesgcm':
+                key = _scrypt_key(
+                    password, salt,
+                    n=enc_data.get('n', SCRYPT_N),
+                    r=enc_data.get('r', SCRYPT_R),
+                    p=enc_data.get('p', SCRYPT_P)
+                )
+                account.private_key = _aesgcm_decrypt(
+                    key, bytes.fromhex(enc_data['nonce']), encrypted_key
+                )
+                    
+            elif method == 'pbkdf2_xor':
+                # Tương thích với wallet file cũ
+                key = hashlib.pbkdf2_hmac(
+                    'sha256', 
+                    password.encode('utf-8'), 
+                    salt, 
+                    PBKDF2_ITERATIONS,
+                    dklen=32
+                )
+                
+                # XOR to decrypt
+                account.private_key = bytes(a ^ b for a, b in zip(encrypted_key, key))
+                
+            else:
+                raise ValueError("Unsupported encryption method")
             
         elif 'private_key' in data:
             if password:
@@ -372,6 +459,27 @@ def generate_account(testnet: bool = False) -> Dict[str, str]:
     return account.create_keys()
 
 
+def generate_accounts(n: int, testnet: bool = False) -> List[Dict[str, str]]:
+    """
+    Tạo nhiều account mới cùng lúc (bulk wallet generation).
+    
+    Args:
+        n: Số account cần tạo
+        testnet: Sử dụng testnet format
+        
+    Returns:
+        list: Danh sách {'private_key', 'public_key', 'address'}
+    """
+    return [
+        {
+            'private_key': account.get_private_key(),
+            'public_key': account.get_public_key(),
+            'address': account.address
+        }
+        for account in Account.generate_batch(n, testnet=testnet)
+    ]
+
+
 def import_account(private_key: str, testnet: bool = False) -> Dict[str, str]:
     """
     Import account từ private key.
@@ -0,0 +1,94 @@
+"""
+Hashing Module - Hash functions dùng chung cho client
+
+Module này gom các hàm hash mà account.py và sendBTC.py cùng dùng,
+để backend chỉ được chọn (probe + self-test) một lần lúc import:
+- sha256(): Single SHA-256
+- dsha256(): Double SHA-256 (txid, sighash, checksum)
+- ripemd160(): RIPEMD-160
+- hash160(): RIPEMD160(SHA256(data)) - pubkey hash
+"""
+import hashlib
+
+
+# =============================================================================
+# BACKEND BINDING
+# =============================================================================
+
+# SHA-256("abc") - test vector để tự kiểm tra backend trước khi dùng
+_SHA256_SELFTEST = bytes.fromhex(
+    'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad'
+)
+
+
+def _select_sha256_backend():
+    """
+    Chọn SHA-256 backend tốt nhất lúc import (chỉ chạy một lần).
+    
+    Thứ tự ưu tiên:
+    1. openssl_sha256: gọi thẳng OpenSSL, bỏ qua lớp dispatch của hashlib.
+       OpenSSL tự detect CPU (SHA-NI / AVX2 / SSE) và chọn assembly phù hợp.
+    2. hashlib.sha256: luôn có sẵn
+    
+    Backend nào không qua được self-test thì bị bỏ qua.
+    
+    Returns:
+        tuple: (tên backend, constructor kiểu hashlib)
+    """
+    candidates = []
+    try:
+        from _hashlib import openssl_sha256
+        candidates.append(('openssl', openssl_sha256))
+    except ImportError:
+        pass
+    candidates.append(('hashlib', hashlib.sha256))
+    
+    for name, constructor in candidates:
+        try:
+            if constructor(b'abc').digest() == _SHA256_SELFTEST:
+                return name, constructor
+        except (ValueError, TypeError):
+            continue
+    return 'hashlib', hashlib.sha256
+
+
+# Tên backend đang dùng (để log/debug)
+SHA256_BACKEND, _sha256 = _select_sha256_backend()
+_new_hash = hashlib.new
+
+# RIPEMD-160: OpenSSL 3 chuyển thuật toán này sang legacy provider, nên
+# hashlib.new('ripemd160') có thể không dùng được -> fallback sang pycryptodome
+try:
+    _new_hash('ripemd160', b'')
+    _RIPEMD160 = None
+except ValueError:
+    try:
+        from Crypto.Hash import RIPEMD160 as _RIPEMD160
+    except ImportError:
+        _RIPEMD160 = None
+
+
+# =============================================================================
+# HASH FUNCTIONS
+# =============================================================================
+
+def sha256(data: bytes) -> bytes:
+    """Single SHA-256."""
+    return _sha256(data).digest()
+
+
+def dsha256(data: bytes) -> bytes:
+    """Double SHA-256."""
+    return _sha256(_sha256(data).digest()).digest()
+
+
+def ripemd160(data: bytes) -> bytes:
+    """RIPEMD-160 (hashlib/OpenSSL, hoặc pycryptodome khi OpenSSL không hỗ trợ)."""
+    if _RIPEMD160 is not None:
+        return _RIPEMD160.new(data).digest()
+    return _new_hash('ripemd160', data).digest()
+
+
+def hash160(data: bytes) -> bytes:
+    """RIPEMD160(SHA256(data)) - 20 bytes."""
+    return ripemd160(_sha256(data).digest())
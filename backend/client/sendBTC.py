@@ -15,15 +15,26 @@ Classes:
 Functions:
 - create_transaction(): Tạo và ký transaction
 - send_transaction(): Gửi transaction đến node
+- send_raw_hex(): Gửi raw transaction (hex) đến node
 """
 import hashlib
 import binascii
+import os
+import struct
 import logging
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple, Union
+from dataclasses import dataclass, field
 
-from ecdsa import SigningKey, SECP256k1
-from ecdsa.util import sigencode_der
+try:
+    # libsecp256k1 (C): ký deterministic RFC6979, trả về DER low-S
+    from coincurve import PrivateKey
+except ImportError:
+    PrivateKey = None
+    from ecdsa import SigningKey, SECP256k1
+    from ecdsa.util import sigencode_der
+
+from client.hashing import dsha256 as _dsha256
 
 
 # =============================================================================
@@ -41,11 +52,30 @@ DEFAULT_FEE = 1000              # 1000 satoshis default fee
 DEFAULT_SEQUENCE = 0xffffffff   # Sequence number (không có RBF)
 SIGHASH_ALL = 1                 # Signature hash type
 
+# Struct packers dựng sẵn (little-endian) cho serialize
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_EMPTY_SIG_INPUT = struct.Struct('<IBI')    # vout + scriptSig rỗng + sequence
+_LOCKTIME_SIGHASH = struct.Struct('<II')    # locktime + SIGHASH type
+_MAX_VARINT_LEN = 9
+
+# P2PKH: OP_DUP OP_HASH160 <push 20> ... OP_EQUALVERIFY OP_CHECKSIG
+_P2PKH_PREFIX = b'\x76\xa9\x14'
+_P2PKH_SUFFIX = b'\x88\xac'
+
+# Từ bao nhiêu inputs thì tính sighash song song (preimage lớn -> hashlib
+# nhả GIL khi hash, các thread chạy song song thật)
+PARALLEL_SIGHASH_MIN_INPUTS = 256
+
 
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
+# VarInt 1 byte dựng sẵn (trường hợp phổ biến: n < 0xfd)
+_VARINT1 = tuple(bytes((i,)) for i in range(0xfd))
+
+
 def encode_varint(n: int) -> bytes:
     """
     Mã hóa số nguyên thành Variable Length Integer.
@@ -56,8 +86,8 @@ def encode_varint(n: int) -> bytes:
     - 65536-4294967295: 0xfe + 4 bytes
     - Lớn hơn: 0xff + 8 bytes
     """
-    if n < 0xfd:
-        return n.to_bytes(1, 'little')
+    if 0 <= n < 0xfd:
+        return _VARINT1[n]
     elif n <= 0xffff:
         return b'\xfd' + n.to_bytes(2, 'little')
     elif n <= 0xffffffff:
@@ -66,11 +96,72 @@ def encode_varint(n: int) -> bytes:
         return b'\xff' + n.to_bytes(8, 'little')
 
 
+# Thread pool tạo lazy, dùng chung cho mọi transaction
+_SIGHASH_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def _get_sighash_pool() -> ThreadPoolExecutor:
+    """Lấy (hoặc tạo) thread pool tính sighash."""
+    global _SIGHASH_POOL
+    if _SIGHASH_POOL is None:
+        _SIGHASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count())
+    return _SIGHASH_POOL
+
+
+def _put(mv: memoryview, off: int, data: bytes) -> int:
+    """Ghi data vào buffer (qua memoryview) tại offset, trả về offset mới."""
+    end = off + len(data)
+    mv[off:end] = data
+    return end
+
+
+def parse_signer(private_key: str):
+    """
+    Parse private key (hex) một lần thành đối tượng ký dùng lại được.
+    
+    Returns:
+        coincurve.PrivateKey hoặc ecdsa.SigningKey (khi không có coincurve)
+    """
+    if PrivateKey is not None:
+        return PrivateKey(bytes.fromhex(private_key))
+    return SigningKey.from_string(bytes.fromhex(private_key), curve=SECP256k1)
+
+
+def _sign_sighash(sighash: bytes, signer) -> str:
+    """
+    Ký sighash đã tính sẵn (deterministic, RFC6979).
+    
+    Args:
+        sighash: Digest 32 bytes cần ký
+        signer: Private key (hex) hoặc signer đã parse bằng parse_signer()
+    
+    Returns:
+        str: Signature (DER format + SIGHASH byte) as hex
+    """
+    if isinstance(signer, str):
+        signer = parse_signer(signer)
+    
+    # sighash đã là digest -> không hash thêm
+    if PrivateKey is not None:
+        signature = signer.sign(sighash, hasher=None)
+    else:
+        signature = signer.sign_digest_deterministic(
+            sighash,
+            sigencode=sigencode_der,
+            hashfunc=hashlib.sha256
+        )
+    
+    # Append SIGHASH_ALL
+    signature += bytes([SIGHASH_ALL])
+    
+    return binascii.hexlify(signature).decode('ascii')
+
+
 # =============================================================================
 # DATA CLASSES
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class UTXO:
     """
     Unspent Transaction Output - Output chưa được chi tiêu.
@@ -91,6 +182,12 @@ class UTXO:
     script_pubkey: str
     address: str
     
+    # ScriptPubKey đã decode (dùng trực tiếp khi tính sighash)
+    script_pubkey_bytes: bytes = field(init=False, repr=False, compare=False, default=b'')
+    
+    def __post_init__(self):
+        self.script_pubkey_bytes = bytes.fromhex(self.script_pubkey) if self.script_pubkey else b''
+    
     def to_dict(self) -> dict:
         """Convert to dictionary."""
         return {
@@ -102,7 +199,7 @@ class UTXO:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class TxInput:
     """
     Transaction Input - Tham chiếu đến UTXO được spend.
@@ -118,6 +215,28 @@ class TxInput:
     script_sig: str = ""
     sequence: int = DEFAULT_SEQUENCE
     
+    # Cache bytes đã decode (txid đảo byte, scriptSig theo hex đã decode)
+    _txid_cache: Tuple[str, bytes] = field(init=False, repr=False, compare=False, default=("", b''))
+    _script_sig_cache: Tuple[str, bytes] = field(init=False, repr=False, compare=False, default=("", b''))
+    
+    @property
+    def txid_le(self) -> bytes:
+        """Previous txid dạng bytes little-endian, chỉ decode lại khi txid thay đổi."""
+        cached_txid, cached_bytes = self._txid_cache
+        if cached_txid != self.txid or not cached_bytes:
+            cached_bytes = bytes.fromhex(self.txid)[::-1]
+            self._txid_cache = (self.txid, cached_bytes)
+        return cached_bytes
+    
+    @property
+    def script_sig_bytes(self) -> bytes:
+        """scriptSig dạng bytes, chỉ decode lại khi script_sig thay đổi."""
+        cached_hex, cached_bytes = self._script_sig_cache
+        if cached_hex != self.script_sig:
+            cached_bytes = bytes.fromhex(self.script_sig) if self.script_sig else b''
+            self._script_sig_cache = (self.script_sig, cached_bytes)
+        return cached_bytes
+    
     def to_dict(self) -> dict:
         """Convert to dictionary."""
         return {
@@ -128,7 +247,7 @@ class TxInput:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class TxOutput:
     """
     Transaction Output - Định nghĩa recipient và amount.
@@ -140,6 +259,18 @@ class TxOutput:
     address: str
     amount: int
     
+    # Cache scriptPubKey (simplified P2PKH) theo address: (address, bytes)
+    _script_pubkey_cache: Tuple[str, bytes] = field(init=False, repr=False, compare=False, default=("", b''))
+    
+    @property
+    def script_pubkey_bytes(self) -> bytes:
+        """ScriptPubKey P2PKH, chỉ build lại khi address thay đổi."""
+        cached_address, cached_bytes = self._script_pubkey_cache
+        if cached_address != self.address or not cached_bytes:
+            cached_bytes = _P2PKH_PREFIX + bytes.fromhex(self.address) + _P2PKH_SUFFIX
+            self._script_pubkey_cache = (self.address, cached_bytes)
+        return cached_bytes
+    
     def to_dict(self) -> dict:
         """Convert to dictionary."""
         return {
@@ -160,7 +291,7 @@ class Transaction:
     1. Tạo Transaction()
     2. add_input() cho mỗi UTXO
     3. add_output() cho mỗi recipient
-    4. sign_input() cho mỗi input
+    4. sign_all() (hoặc sign_input() cho từng input)
     5. to_hex() để broadcast
     
     Attributes:
@@ -184,6 +315,9 @@ class Transaction:
         self.outputs: List[TxOutput] = []
         self.locktime = locktime
         self.txid: Optional[str] = None
+        
+        # (key, skeleton) để tính sighash (xem _get_signing_skeleton)
+        self._signing_skeleton: Optional[Tuple[tuple, Tuple[bytes, List[int]]]] = None
     
     # =========================================================================
     # INPUT/OUTPUT MANAGEMENT
@@ -204,8 +338,8 @@ class Transaction:
     def sign_input(
         self, 
         input_index: int, 
-        private_key: str, 
-        utxo_script_pubkey: str
+        private_key, 
+        utxo_script_pubkey: Union[bytes, str]
     ) -> str:
         """
         Ký một input với private key.
@@ -219,70 +353,143 @@ class Transaction:
         
         Args:
             input_index: Index của input cần ký
-            private_key: Private key (hex string)
-            utxo_script_pubkey: ScriptPubKey của UTXO được spend
+            private_key: Private key (hex string) hoặc signer từ parse_signer()
+            utxo_script_pubkey: ScriptPubKey của UTXO được spend (bytes, hoặc hex)
             
         Returns:
             str: Signature (DER format + SIGHASH byte) as hex
         """
-        # Load private key
-        sk = SigningKey.from_string(
-            bytes.fromhex(private_key), 
-            curve=SECP256k1
-        )
-        
         # Tính signature hash
         sighash = self._calculate_sighash(input_index, utxo_script_pubkey)
         
-        # Ký deterministically
-        signature = sk.sign_digest_deterministic(
-            sighash,
-            sigencode=sigencode_der,
-            hashfunc=hashlib.sha256
-        )
+        return _sign_sighash(sighash, private_key)
+    
+    def sign_all(self, private_key, script_pubkeys: List[Union[bytes, str]]) -> None:
+        """
+        Ký tất cả inputs với cùng một private key.
+        
+        Key chỉ được parse một lần cho cả transaction thay vì mỗi input.
         
-        # Append SIGHASH_ALL
-        signature += bytes([SIGHASH_ALL])
+        Args:
+            private_key: Private key (hex string) hoặc signer từ parse_signer()
+            script_pubkeys: ScriptPubKey của UTXO tương ứng với từng input
+        """
+        signer = parse_signer(private_key) if isinstance(private_key, str) else private_key
         
-        return binascii.hexlify(signature).decode('ascii')
+        # Tính toàn bộ sighash trước (tx chưa bị sửa), sau đó chỉ còn ECDSA sign
+        sighashes = self.calculate_sighashes(script_pubkeys)
+        for inp, sighash in zip(self.inputs, sighashes):
+            inp.script_sig = _sign_sighash(sighash, signer)
+    
+    def calculate_sighashes(self, script_pubkeys: List[Union[bytes, str]]) -> List[bytes]:
+        """
+        Tính sighash cho tất cả inputs trong một lượt (trước khi ký).
+        
+        Sighash của mỗi input không phụ thuộc scriptSig của các input khác
+        (đều bị làm rỗng), nên có thể tính hết trước rồi mới ký.
+        
+        Args:
+            script_pubkeys: ScriptPubKey của UTXO tương ứng với từng input
+            
+        Returns:
+            list: Sighash (32 bytes) theo thứ tự inputs
+        """
+        skeleton = self._get_signing_skeleton()
+        
+        # Transaction lớn (consolidation): các preimage độc lập, mỗi cái cỡ
+        # toàn bộ tx -> chia cho thread pool
+        if len(script_pubkeys) >= PARALLEL_SIGHASH_MIN_INPUTS and (os.cpu_count() or 1) > 1:
+            return list(_get_sighash_pool().map(
+                lambda item: self._calculate_sighash(item[0], item[1], skeleton),
+                enumerate(script_pubkeys)
+            ))
+        
+        return [
+            self._calculate_sighash(i, script_pubkey, skeleton)
+            for i, script_pubkey in enumerate(script_pubkeys)
+        ]
     
     def _calculate_sighash(
         self, 
         input_index: int, 
-        script_pubkey: str
+        script_pubkey: Union[bytes, str],
+        skeleton: Optional[Tuple[bytes, List[int]]] = None
     ) -> bytes:
         """
         Tính hash để ký cho một input.
         
         Simplified SIGHASH_ALL:
-        1. Copy transaction
-        2. Empty tất cả scriptSig
-        3. Put scriptPubKey vào input đang ký
-        4. Append SIGHASH type
-        5. Double SHA-256
-        """
-        # Tạo copy để ký
-        tx_copy = Transaction(version=self.version, locktime=self.locktime)
-        
-        for i, inp in enumerate(self.inputs):
-            # ScriptSig = scriptPubKey cho input đang ký, empty cho các input khác
-            script = script_pubkey if i == input_index else ""
-            tx_copy.add_input(TxInput(
-                txid=inp.txid,
-                vout=inp.vout,
-                script_sig=script,
-                sequence=inp.sequence
-            ))
+        1. Serialize transaction với tất cả scriptSig rỗng (+ SIGHASH type)
+        2. Chèn scriptPubKey vào slot scriptSig của input đang ký
+        3. Double SHA-256
         
-        for out in self.outputs:
-            tx_copy.add_output(out)
+        Args:
+            input_index: Index của input
+            script_pubkey: ScriptPubKey của UTXO được spend (bytes, hoặc hex)
+            skeleton: Kết quả _serialize_for_signing() dùng lại giữa các input
+        """
+        buf, slots = skeleton if skeleton is not None else self._get_signing_skeleton()
         
-        # Serialize + SIGHASH type
-        serialized = tx_copy.serialize()
-        serialized += SIGHASH_ALL.to_bytes(4, 'little')
+        # Slot là byte độ dài (0x00) của scriptSig rỗng
+        offset = slots[input_index]
+        script = bytes.fromhex(script_pubkey) if isinstance(script_pubkey, str) else script_pubkey
+        preimage = b''.join((buf[:offset], encode_varint(len(script)), script, buf[offset + 1:]))
         
         # Double SHA-256
-        return hashlib.sha256(hashlib.sha256(serialized).digest()).digest()
+        return _dsha256(preimage)
+    
+    def _get_signing_skeleton(self) -> Tuple[bytes, List[int]]:
+        """
+        Skeleton dùng chung cho mọi lần tính sighash của transaction này.
+        
+        Chỉ phụ thuộc version, locktime, outpoint/sequence của inputs và
+        outputs (không phụ thuộc scriptSig), nên ký từng input qua
+        sign_input() không phải serialize lại toàn bộ tx mỗi lần. Cache được
+        key theo đúng các field đó nên sửa tx sau khi ký vẫn được nhận ra.
+        """
+        key = (
+            self.version,
+            self.locktime,
+            tuple((inp.txid, inp.vout, inp.sequence) for inp in self.inputs),
+            tuple((out.address, out.amount) for out in self.outputs),
+        )
+        cached = self._signing_skeleton
+        if cached is None or cached[0] != key:
+            cached = self._signing_skeleton = (key, self._serialize_for_signing())
+        return cached[1]
+    
+    def _serialize_for_signing(self) -> Tuple[bytes, List[int]]:
+        """
+        Serialize transaction một lần với mọi scriptSig rỗng + SIGHASH type.
+        
+        Returns:
+            tuple: (bytes đã serialize, offset slot scriptSig của từng input)
+        """
+        out_scripts = self._output_scripts()
+        
+        # Kích thước chính xác: mỗi input = txid(32) + vout(4) + 0x00 + sequence(4)
+        size = (_U32.size + _MAX_VARINT_LEN + len(self.inputs) * (32 + _EMPTY_SIG_INPUT.size)
+                + self._outputs_size(out_scripts) + _LOCKTIME_SIGHASH.size)
+        buf = bytearray(size)
+        mv = memoryview(buf)
+        slots = []
+        
+        _U32.pack_into(buf, 0, self.version)
+        off = _put(mv, _U32.size, encode_varint(len(self.inputs)))
+        
+        for inp in self.inputs:
+            mv[off:off + 32] = inp.txid_le
+            off += 32
+            # vout + scriptSig rỗng (VarInt độ dài = 0) + sequence
+            slots.append(off + 4)
+            _EMPTY_SIG_INPUT.pack_into(buf, off, inp.vout, 0, inp.sequence)
+            off += _EMPTY_SIG_INPUT.size
+        
+        off = self._serialize_outputs(buf, mv, off, out_scripts)
+        _LOCKTIME_SIGHASH.pack_into(buf, off, self.locktime, SIGHASH_ALL)
+        off += _LOCKTIME_SIGHASH.size
+        
+        return bytes(mv[:off]), slots
     
     # =========================================================================
     # SERIALIZATION
@@ -299,45 +506,69 @@ class Transaction:
         - Output count (VarInt)
         - Outputs
         - Locktime (4 bytes)
+        
+        Buffer được cấp phát một lần theo cận trên của kích thước rồi ghi
+        bằng slice assignment, thay vì nối dần vào bytearray.
         """
-        result = bytearray()
+        script_sigs = [inp.script_sig_bytes for inp in self.inputs]
+        out_scripts = self._output_scripts()
+        
+        size = (_U32.size + _MAX_VARINT_LEN
+                + sum(32 + 4 + _MAX_VARINT_LEN + len(script) + 4 for script in script_sigs)
+                + self._outputs_size(out_scripts) + _U32.size)
+        buf = bytearray(size)
+        mv = memoryview(buf)
         
         # Version
-        result.extend(self.version.to_bytes(4, 'little'))
+        _U32.pack_into(buf, 0, self.version)
         
         # Input count
-        result.extend(encode_varint(len(self.inputs)))
+        off = _put(mv, _U32.size, encode_varint(len(self.inputs)))
         
         # Inputs
-        for inp in self.inputs:
-            # Previous tx hash (reversed)
-            result.extend(bytes.fromhex(inp.txid)[::-1])
-            # Previous output index
-            result.extend(inp.vout.to_bytes(4, 'little'))
+        for inp, script in zip(self.inputs, script_sigs):
+            # Previous tx hash (reversed) + previous output index
+            mv[off:off + 32] = inp.txid_le
+            _U32.pack_into(buf, off + 32, inp.vout)
             # ScriptSig
-            script = bytes.fromhex(inp.script_sig) if inp.script_sig else b''
-            result.extend(encode_varint(len(script)))
-            result.extend(script)
+            off = _put(mv, off + 36, encode_varint(len(script)))
+            off = _put(mv, off, script)
             # Sequence
-            result.extend(inp.sequence.to_bytes(4, 'little'))
-        
-        # Output count
-        result.extend(encode_varint(len(self.outputs)))
+            _U32.pack_into(buf, off, inp.sequence)
+            off += 4
         
         # Outputs
-        for out in self.outputs:
-            # Amount
-            result.extend(out.amount.to_bytes(8, 'little'))
-            # ScriptPubKey (simplified P2PKH)
-            script = f"76a914{out.address}88ac"
-            script_bytes = bytes.fromhex(script)
-            result.extend(encode_varint(len(script_bytes)))
-            result.extend(script_bytes)
+        off = self._serialize_outputs(buf, mv, off, out_scripts)
         
         # Locktime
-        result.extend(self.locktime.to_bytes(4, 'little'))
+        _U32.pack_into(buf, off, self.locktime)
+        off += 4
+        
+        return bytes(mv[:off])
+    
+    def _output_scripts(self) -> List[bytes]:
+        """ScriptPubKey (simplified P2PKH) của từng output."""
+        return [out.script_pubkey_bytes for out in self.outputs]
+    
+    @staticmethod
+    def _outputs_size(out_scripts: List[bytes]) -> int:
+        """Cận trên số bytes của output count + outputs."""
+        return _MAX_VARINT_LEN + sum(8 + _MAX_VARINT_LEN + len(script) for script in out_scripts)
+    
+    def _serialize_outputs(self, buf: bytearray, mv: memoryview, off: int,
+                           out_scripts: List[bytes]) -> int:
+        """Ghi output count + outputs vào buffer từ offset off, trả về offset mới."""
+        # Output count
+        off = _put(mv, off, encode_varint(len(self.outputs)))
+        
+        for out, script in zip(self.outputs, out_scripts):
+            # Amount
+            _U64.pack_into(buf, off, out.amount)
+            # ScriptPubKey
+            off = _put(mv, off + 8, encode_varint(len(script)))
+            off = _put(mv, off, script)
         
-        return bytes(result)
+        return off
     
     def calculate_fee(self, utxos: List[UTXO]) -> int:
         """
@@ -381,7 +612,7 @@ def create_transaction(
     1. Tạo Transaction object
     2. Thêm inputs từ UTXOs
     3. Thêm outputs
-    4. Ký từng input
+    4. Ký tất cả inputs (sign_all: parse key một lần)
     5. Tính TXID
     
     Args:
@@ -403,22 +634,18 @@ def create_transaction(
     for output in outputs:
         tx.add_output(output)
     
-    # Sign each input
-    for i, utxo in enumerate(inputs):
-        signature = tx.sign_input(i, private_key, utxo.script_pubkey)
-        tx.inputs[i].script_sig = signature
+    # Parse key một lần, tính sighash cho mọi input rồi ký
+    tx.sign_all(parse_signer(private_key), [utxo.script_pubkey_bytes for utxo in inputs])
     
     # Calculate TXID
-    tx.txid = hashlib.sha256(
-        hashlib.sha256(tx.serialize()).digest()
-    ).hexdigest()
+    tx.txid = _dsha256(tx.serialize()).hex()
     
     logger.info(f"Created transaction: {tx.txid[:16]}...")
     return tx
 
 
 def send_transaction(
-    tx_hex: str, 
+    tx: Transaction, 
     node_url: str = "http://localhost:8332"
 ) -> dict:
     """
@@ -428,19 +655,42 @@ def send_transaction(
     Production cần kết nối thực đến Bitcoin node RPC.
     
     Args:
-        tx_hex: Raw transaction hex
+        tx: Transaction đã ký (txid đã được create_transaction tính)
         node_url: URL của Bitcoin node
         
     Returns:
         dict: Response từ node
     """
-    # Mock response
-    txid = hashlib.sha256(bytes.fromhex(tx_hex)).hexdigest()
+    # Dùng lại txid đã tính, không hash lại raw tx
+    if tx.txid is None:
+        tx.txid = _dsha256(tx.serialize()).hex()
+    
+    return _mock_send(tx.txid)
+
+
+def send_raw_hex(
+    tx_hex: str, 
+    node_url: str = "http://localhost:8332"
+) -> dict:
+    """
+    Gửi raw transaction (hex) - cho caller chỉ có hex, không có Transaction.
     
+    Args:
+        tx_hex: Raw transaction hex
+        node_url: URL của Bitcoin node
+        
+    Returns:
+        dict: Response từ node
+    """
+    return _mock_send(_dsha256(bytes.fromhex(tx_hex)).hex())
+
+
+def _mock_send(txid: str) -> dict:
+    """Mock response của node cho transaction đã gửi."""
     logger.info(f"Transaction sent (simulated): {txid[:16]}...")
     
     return {
         'txid': txid,
         'success': True,
         'message': 'Transaction sent successfully (simulated)'
-    }
\ No newline at end of file
+    }
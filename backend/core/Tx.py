@@ -6,19 +6,34 @@ Module này chứa các class cơ bản để xây dựng và xử lý Bitcoin t
 - TxIn: Transaction input - tham chiếu đến output của transaction trước
 - TxOut: Transaction output - định nghĩa số tiền và điều kiện chi tiêu
 - Tx: Transaction đầy đủ với inputs, outputs và metadata
+- CoinbaseTx: Coinbase transaction (transaction đầu tiên của block)
 
 Tất cả các class sử dụng __slots__ để tối ưu bộ nhớ.
 """
 import hashlib
+import json
+import os
+import struct
+import sys
+from operator import attrgetter
+from binascii import unhexlify as _unhexlify
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Any, Union
 
+try:
+    # orjson (C) - encode JSON thẳng ra bytes
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # =============================================================================
 # CONSTANTS - Các hằng số chuẩn Bitcoin
 # =============================================================================
 
 # Hash của transaction trống (dùng cho coinbase transaction)
-COINBASE_PREV_TX = '0' * 64  # 32 bytes = 64 hex chars
+# Được intern: TxIn cũng intern prev_tx nên is_coinbase() so sánh bằng `is`
+COINBASE_PREV_TX = sys.intern('0' * 64)  # 32 bytes = 64 hex chars
 
 # Previous index đặc biệt cho coinbase transaction  
 COINBASE_PREV_INDEX = 0xffffffff
@@ -26,11 +41,64 @@ COINBASE_PREV_INDEX = 0xffffffff
 # Sequence number mặc định (không có RBF - Replace-By-Fee)
 DEFAULT_SEQUENCE = 0xffffffff
 
+# Signature hash type
+SIGHASH_ALL = 1
+
+# Tx từ kích thước này (bytes) được hash trên thread pool trong batch_ids():
+# hashlib chỉ nhả GIL với dữ liệu > 2047 bytes
+PARALLEL_TXID_MIN_BYTES = 2048
+
 
 # =============================================================================
 # HELPER FUNCTIONS - Các hàm tiện ích dùng chung
 # =============================================================================
 
+# openssl_sha256 gọi thẳng OpenSSL, bỏ qua lớp dispatch của hashlib
+try:
+    from _hashlib import openssl_sha256 as _sha256
+except ImportError:
+    _sha256 = hashlib.sha256
+
+
+def _hash256(data: bytes) -> bytes:
+    """Double SHA-256."""
+    return _sha256(_sha256(data).digest()).digest()
+
+
+# Thread pool tạo lazy, dùng cho batch_ids()
+_TXID_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def _get_txid_pool() -> ThreadPoolExecutor:
+    """Lấy (hoặc tạo) thread pool tính TXID."""
+    global _TXID_POOL
+    if _TXID_POOL is None:
+        _TXID_POOL = ThreadPoolExecutor(max_workers=os.cpu_count())
+    return _TXID_POOL
+
+
+# Struct packers dựng sẵn (little-endian) cho serialize
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_LOCKTIME_SIGHASH = struct.Struct('<II')    # locktime + SIGHASH type
+_COINBASE_HEAD = struct.Struct('<IB32sI')   # version + input count + prev_tx + prev_index
+_COINBASE_MID = struct.Struct('<IBQ')       # sequence + output count + amount
+
+# Lấy TxOut.amount (dùng với map, không qua generator)
+_get_amount = attrgetter('amount')
+
+# VarInt 1 byte dựng sẵn (trường hợp phổ biến: n < 0xfd)
+_VARINT1 = tuple(bytes((i,)) for i in range(0xfd))
+
+# VarInt nhiều byte, index = số byte cần để biểu diễn n (1..8):
+# 1-2 byte -> 0xfd + uint16, 3-4 byte -> 0xfe + uint32, 5-8 byte -> 0xff + uint64
+_VARINT_FD = (0xfd, struct.Struct('<BH'))
+_VARINT_FE = (0xfe, struct.Struct('<BI'))
+_VARINT_FF = (0xff, struct.Struct('<BQ'))
+_VARINT_WIDE = (None, _VARINT_FD, _VARINT_FD, _VARINT_FE, _VARINT_FE,
+                _VARINT_FF, _VARINT_FF, _VARINT_FF, _VARINT_FF)
+
+
 def encode_varint(n: int) -> bytes:
     """
     Mã hóa số nguyên thành Variable Length Integer (VarInt).
@@ -47,14 +115,18 @@ def encode_varint(n: int) -> bytes:
     Returns:
         bytes: VarInt đã mã hóa (little-endian)
     """
-    if n < 0xfd:
-        return n.to_bytes(1, 'little')
-    elif n <= 0xffff:
-        return b'\xfd' + n.to_bytes(2, 'little')
-    elif n <= 0xffffffff:
-        return b'\xfe' + n.to_bytes(4, 'little')
-    else:
-        return b'\xff' + n.to_bytes(8, 'little')
+    if 0 <= n < 0xfd:
+        return _VARINT1[n]
+    # Chọn (prefix, packer) theo số byte của n, không qua chuỗi if/elif
+    prefix, packer = _VARINT_WIDE[(n.bit_length() + 7) >> 3]
+    return packer.pack(prefix, n)
+
+
+def _json_default(obj: Any) -> str:
+    """orjson default: bytes trong script cmds -> hex (giống to_dict())."""
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.hex()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
 
 
 # =============================================================================
@@ -75,8 +147,11 @@ class Script:
     
     Attributes:
         cmds: Danh sách các lệnh/dữ liệu trong script
+    
+    Kết quả serialize() và dict_cmds() được cache: gán lại cmds sẽ xóa cache,
+    còn sửa trực tiếp list cmds (append...) sau đó thì không được hỗ trợ.
     """
-    __slots__ = ['cmds']
+    __slots__ = ['_cmds', '_serialized', '_dict_cmds']
     
     def __init__(self, cmds: Optional[List[Any]] = None):
         """
@@ -85,7 +160,18 @@ class Script:
         Args:
             cmds: Danh sách lệnh, mặc định là rỗng
         """
-        self.cmds: List[Any] = cmds if cmds is not None else []
+        self.cmds = cmds if cmds is not None else []
+    
+    @property
+    def cmds(self) -> List[Any]:
+        """Danh sách các lệnh/dữ liệu trong script."""
+        return self._cmds
+    
+    @cmds.setter
+    def cmds(self, value: List[Any]) -> None:
+        self._cmds = value
+        self._serialized = None
+        self._dict_cmds = None
     
     def __repr__(self) -> str:
         return f"Script({self.cmds})"
@@ -105,10 +191,27 @@ class Script:
         """Script rỗng = False, có lệnh = True."""
         return len(self.cmds) > 0
     
+    def dict_cmds(self) -> List[Any]:
+        """
+        cmds dạng dùng cho to_dict(): bytes -> hex string, còn lại giữ nguyên.
+        
+        Chuyển đổi một lần rồi cache, to_dict() chỉ copy list thay vì kiểm
+        tra kiểu từng lệnh mỗi lần gọi.
+        """
+        if self._dict_cmds is None:
+            self._dict_cmds = [
+                cmd.hex() if isinstance(cmd, bytes) else cmd
+                for cmd in self._cmds
+            ]
+        return self._dict_cmds
+    
     def serialize(self) -> bytes:
         """
-        Serialize script thành bytes.
+        Serialize script thành bytes (cache sau lần đầu).
         """
+        if self._serialized is not None:
+            return self._serialized
+        
         result = bytearray()
         for cmd in self.cmds:
             if isinstance(cmd, int):
@@ -130,7 +233,9 @@ class Script:
                         b = cmd.encode('utf-8')
                         result.extend(encode_varint(len(b)))
                         result.extend(b)
-        return bytes(result)
+        
+        self._serialized = bytes(result)
+        return self._serialized
 
 
 # =============================================================================
@@ -152,7 +257,7 @@ class TxIn:
         script_sig: Unlocking script (signature + public key)
         sequence: Sequence number cho RBF và timelocks
     """
-    __slots__ = ['prev_tx', 'prev_index', 'script_sig', 'sequence']
+    __slots__ = ['_prev_tx', '_prev_tx_le', 'prev_index', 'script_sig', 'sequence']
     
     def __init__(
         self, 
@@ -175,6 +280,26 @@ class TxIn:
         self.script_sig = script_sig if script_sig is not None else Script()
         self.sequence = sequence
     
+    @property
+    def prev_tx(self) -> str:
+        """Hash của transaction trước (hex)."""
+        return self._prev_tx
+    
+    @prev_tx.setter
+    def prev_tx(self, value: str) -> None:
+        # Intern hash 64 ký tự: cùng txid -> cùng object (is_coinbase so sánh bằng `is`)
+        if type(value) is str and len(value) == 64:
+            value = sys.intern(value)
+        self._prev_tx = value
+        self._prev_tx_le = None
+    
+    @property
+    def prev_tx_le(self) -> bytes:
+        """prev_tx dạng bytes little-endian (decode + đảo một lần, dùng khi serialize)."""
+        if self._prev_tx_le is None:
+            self._prev_tx_le = _unhexlify(self._prev_tx)[::-1]
+        return self._prev_tx_le
+    
     def is_coinbase(self) -> bool:
         """
         Kiểm tra xem input này có phải là coinbase hay không.
@@ -183,24 +308,18 @@ class TxIn:
         - prev_tx là 32 bytes zeros
         - prev_index là 0xffffffff
         """
+        # prev_tx đã được intern trong setter -> so sánh identity thay vì 64 ký tự
         return (
-            self.prev_tx == COINBASE_PREV_TX and 
+            self._prev_tx is COINBASE_PREV_TX and 
             self.prev_index == COINBASE_PREV_INDEX
         )
         
     def to_dict(self) -> dict:
         """Chuyển đổi thành dictionary để serialize."""
-        cmds = []
-        for cmd in self.script_sig.cmds:
-            if isinstance(cmd, bytes):
-                cmds.append(cmd.hex())
-            else:
-                cmds.append(cmd)
-                
         return {
             'prev_tx': self.prev_tx,
             'prev_index': self.prev_index,
-            'script_sig': cmds,
+            'script_sig': list(self.script_sig.dict_cmds()),
             'sequence': self.sequence
         }
 
@@ -243,16 +362,9 @@ class TxOut:
         
     def to_dict(self) -> dict:
         """Chuyển đổi thành dictionary để serialize."""
-        cmds = []
-        for cmd in self.script_pubkey.cmds:
-            if isinstance(cmd, bytes):
-                cmds.append(cmd.hex())
-            else:
-                cmds.append(cmd)
-
         return {
             'amount': self.amount,
-            'script_pubkey': cmds
+            'script_pubkey': list(self.script_pubkey.dict_cmds())
         }
 
 
@@ -291,8 +403,16 @@ class Tx:
         tx_ins: Danh sách inputs
         tx_outs: Danh sách outputs
         locktime: Thời điểm sớm nhất transaction có thể được confirm
+    
+    Transaction được coi là bất biến sau khi build xong: serialize(), id(),
+    total_output_amount() và dữ liệu cho sig_hash() được cache. Nếu sửa tx
+    sau khi đã gọi các hàm này (vd. gán script_sig khi ký) thì phải gọi
+    invalidate_cache().
     """
-    __slots__ = ['version', 'tx_ins', 'tx_outs', 'locktime']
+    __slots__ = [
+        'version', 'tx_ins', 'tx_outs', 'locktime',
+        '_serialized', '_txid', '_sighash_cache', '_total_output'
+    ]
     
     def __init__(
         self, 
@@ -314,6 +434,19 @@ class Tx:
         self.tx_ins = tx_ins
         self.tx_outs = tx_outs
         self.locktime = locktime
+        
+        # Cache serialize()/id() - xem invalidate_cache()
+        self._serialized: Optional[bytes] = None
+        self._txid: Optional[str] = None
+        self._sighash_cache: Optional[tuple] = None
+        self._total_output: Optional[int] = None
+    
+    def invalidate_cache(self) -> None:
+        """Xóa mọi cache (serialize, id, sig_hash, tổng output) sau khi tx bị sửa."""
+        self._serialized = None
+        self._txid = None
+        self._sighash_cache = None
+        self._total_output = None
 
     def id(self) -> str:
         """
@@ -326,11 +459,43 @@ class Tx:
         Returns:
             str: TXID dưới dạng hex string (64 ký tự)
         """
-        tx_serialized = self.serialize()
-        # Double SHA-256
-        tx_hash = hashlib.sha256(hashlib.sha256(tx_serialized).digest()).digest()
-        # Đảo ngược bytes để ra TXID format chuẩn
-        return tx_hash[::-1].hex()
+        if self._txid is None:
+            # Double SHA-256, đảo ngược bytes để ra TXID format chuẩn
+            self._txid = _hash256(self.serialize())[::-1].hex()
+        return self._txid
+    
+    @staticmethod
+    def batch_ids(txs: List['Tx']) -> List[str]:
+        """
+        Tính TXID cho nhiều transactions trong một lượt (vd. khi build block).
+        
+        Serialize + double SHA-256 trong một vòng lặp với hàm hash đã bind
+        sẵn, thay vì gọi tx.id() riêng lẻ cho từng transaction. Các tx có
+        kích thước >= PARALLEL_TXID_MIN_BYTES được hash song song.
+        
+        Args:
+            txs: Danh sách transactions
+            
+        Returns:
+            list: TXID (hex) theo thứ tự của txs
+        """
+        sha256 = _sha256
+        
+        # Tx lớn: hashlib nhả GIL khi hash -> chia cho thread pool
+        large = [
+            tx for tx in txs
+            if tx._txid is None and len(tx.serialize()) >= PARALLEL_TXID_MIN_BYTES
+        ]
+        if len(large) > 1 and (os.cpu_count() or 1) > 1:
+            for tx, tx_hash in zip(large, _get_txid_pool().map(_hash256, [tx.serialize() for tx in large])):
+                tx._txid = tx_hash[::-1].hex()
+        
+        txids = []
+        for tx in txs:
+            if tx._txid is None:
+                tx._txid = sha256(sha256(tx.serialize()).digest()).digest()[::-1].hex()
+            txids.append(tx._txid)
+        return txids
     
     def serialize(self) -> bytes:
         """
@@ -347,49 +512,126 @@ class Tx:
         Returns:
             bytes: Transaction đã serialize
         """
-        result = bytearray()
+        if self._serialized is not None:
+            return self._serialized
+        
+        # Cấp phát buffer một lần với kích thước chính xác
+        buf = bytearray(self._serialized_size())
+        self.serialize_into(buf, 0)
+        self._serialized = bytes(buf)
+        return self._serialized
+    
+    def serialize_into(self, buf: bytearray, offset: int) -> int:
+        """
+        Ghi transaction đã serialize thẳng vào buf tại offset (không tạo bytes
+        trung gian), vd. khi ghi nhiều tx liên tiếp vào một buffer chung.
+        
+        buf phải còn đủ chỗ: _serialized_size() bytes tính từ offset.
+        
+        Args:
+            buf: Buffer đích
+            offset: Vị trí bắt đầu ghi
+            
+        Returns:
+            int: Offset ngay sau transaction vừa ghi
+        """
+        if self._serialized is not None:
+            end = offset + len(self._serialized)
+            buf[offset:end] = self._serialized
+            return end
+        
+        mv = memoryview(buf)
         
         # 1. Version (4 bytes, little-endian)
-        result.extend(self.version.to_bytes(4, 'little'))
+        _U32.pack_into(buf, offset, self.version)
+        off = offset + 4
         
         # 2. Input count (VarInt)
-        result.extend(encode_varint(len(self.tx_ins)))
+        n_ins = encode_varint(len(self.tx_ins))
+        mv[off:off + len(n_ins)] = n_ins
+        off += len(n_ins)
         
         # 3. Serialize từng input
         for tx_in in self.tx_ins:
             # Previous tx hash (32 bytes, reversed to little-endian)
-            prev_tx_bytes = bytes.fromhex(tx_in.prev_tx)[::-1]
-            result.extend(prev_tx_bytes)
+            mv[off:off + 32] = tx_in.prev_tx_le
             
             # Previous output index (4 bytes, little-endian)
-            result.extend(tx_in.prev_index.to_bytes(4, 'little'))
+            _U32.pack_into(buf, off + 32, tx_in.prev_index)
+            off += 36
             
             # ScriptSig (VarInt length + script bytes)
             script_sig = tx_in.script_sig.serialize()
-            result.extend(encode_varint(len(script_sig)))
-            result.extend(script_sig)
+            length = encode_varint(len(script_sig))
+            mv[off:off + len(length)] = length
+            off += len(length)
+            mv[off:off + len(script_sig)] = script_sig
+            off += len(script_sig)
             
             # Sequence (4 bytes, little-endian)
-            result.extend(tx_in.sequence.to_bytes(4, 'little'))
+            _U32.pack_into(buf, off, tx_in.sequence)
+            off += 4
         
         # 4. Output count (VarInt)
-        result.extend(encode_varint(len(self.tx_outs)))
+        n_outs = encode_varint(len(self.tx_outs))
+        mv[off:off + len(n_outs)] = n_outs
+        off += len(n_outs)
         
         # 5. Serialize từng output
         for tx_out in self.tx_outs:
             # Amount (8 bytes, little-endian)
-            result.extend(tx_out.amount.to_bytes(8, 'little'))
+            _U64.pack_into(buf, off, tx_out.amount)
+            off += 8
             
             # ScriptPubKey (VarInt length + script bytes)
             script_pubkey = tx_out.script_pubkey.serialize()
-            result.extend(encode_varint(len(script_pubkey)))
-            result.extend(script_pubkey)
+            length = encode_varint(len(script_pubkey))
+            mv[off:off + len(length)] = length
+            off += len(length)
+            mv[off:off + len(script_pubkey)] = script_pubkey
+            off += len(script_pubkey)
         
         # 6. Locktime (4 bytes, little-endian)
-        result.extend(self.locktime.to_bytes(4, 'little'))
+        _U32.pack_into(buf, off, self.locktime)
         
-        return bytes(result)
+        mv.release()
+        return off + 4
+    
+    def _serialized_size(self) -> int:
+        """
+        Kích thước (bytes) của transaction sau khi serialize.
+        
+        Script.serialize() được cache nên gọi ở đây không tốn thêm khi
+        serialize() ghi dữ liệu ngay sau đó.
+        """
+        size = 4 + len(encode_varint(len(self.tx_ins)))
+        for tx_in in self.tx_ins:
+            n = len(tx_in.script_sig.serialize())
+            # prev_tx + prev_index + VarInt + script_sig + sequence
+            size += 36 + len(encode_varint(n)) + n + 4
+        
+        size += len(encode_varint(len(self.tx_outs)))
+        for tx_out in self.tx_outs:
+            n = len(tx_out.script_pubkey.serialize())
+            # amount + VarInt + script_pubkey
+            size += 8 + len(encode_varint(n)) + n
+        
+        # locktime
+        return size + 4
 
+    def _serialize_outputs(self) -> bytes:
+        """
+        Serialize phần outputs: output count (VarInt) + từng output
+        (amount 8 bytes + VarInt length + script_pubkey).
+        """
+        parts = [encode_varint(len(self.tx_outs))]
+        for tx_out in self.tx_outs:
+            script_pubkey = tx_out.script_pubkey.serialize()
+            parts.append(_U64.pack(tx_out.amount))
+            parts.append(encode_varint(len(script_pubkey)))
+            parts.append(script_pubkey)
+        return b''.join(parts)
+    
     def sig_hash(self, input_index: int, script_pubkey: Script) -> bytes:
         """
         Tính hash của transaction để ký/xác thực (SIGHASH_ALL).
@@ -401,6 +643,10 @@ class Tx:
         4. Serialize transaction + append SIGHASH_TYPE (1 = SIGHASH_ALL)
         5. Double SHA-256
         
+        Thay vì tạo bản sao và serialize lại cả tx cho mỗi input, dùng
+        midstate SHA-256 của phần đầu chung (version + các input trước
+        input_index, scriptSig rỗng) rồi chỉ hash thêm phần còn lại.
+        
         Args:
             input_index: Index của input đang được xử lý
             script_pubkey: Locking script của UTXO mà input này đang chi tiêu
@@ -408,24 +654,62 @@ class Tx:
         Returns:
             bytes: 32-byte hash
         """
-        # 1. Tạo bản sao (deep copy đơn giản)
-        temp_ins = []
-        for i, tx_in in enumerate(self.tx_ins):
-            if i == input_index:
-                # Gán script_pubkey cho input đang xét
-                temp_ins.append(TxIn(tx_in.prev_tx, tx_in.prev_index, script_pubkey, tx_in.sequence))
-            else:
-                # Xóa script_sig cho các inputs khác
-                temp_ins.append(TxIn(tx_in.prev_tx, tx_in.prev_index, Script(), tx_in.sequence))
-        
-        temp_tx = Tx(self.version, temp_ins, self.tx_outs, self.locktime)
-        
-        # 2. Serialize + SIGHASH_ALL (1)
-        # SIGHASH_ALL là 4 bytes little-endian
-        s = temp_tx.serialize() + (1).to_bytes(4, 'little')
+        midstates, outpoints, sequences, tails = self._sighash_midstates()
+        
+        script = script_pubkey.serialize()
+        h = midstates[input_index].copy()
+        h.update(outpoints[input_index])
+        h.update(encode_varint(len(script)))
+        h.update(script)
+        h.update(sequences[input_index])
+        # Các input sau (scriptSig rỗng) + outputs + locktime + SIGHASH_ALL
+        h.update(tails[input_index + 1])
+        
+        return _sha256(h.digest()).digest()
+    
+    def _sighash_midstates(self):
+        """
+        Dữ liệu dùng chung cho mọi sig_hash() của transaction (build một lần,
+        xóa bởi invalidate_cache()).
         
-        # 3. Double SHA-256
-        return hashlib.sha256(hashlib.sha256(s).digest()).digest()
+        Returns:
+            tuple: (midstates, outpoints, sequences, tails)
+            - midstates[i]: SHA-256 state sau version + input count + inputs[:i]
+            - outpoints[i]: prev_tx (LE) + prev_index của input i
+            - sequences[i]: sequence (4 bytes) của input i
+            - tails[i]: inputs[i:] (scriptSig rỗng) + outputs + locktime + SIGHASH
+        """
+        if self._sighash_cache is not None:
+            return self._sighash_cache
+        
+        outpoints = [
+            tx_in.prev_tx_le + _U32.pack(tx_in.prev_index)
+            for tx_in in self.tx_ins
+        ]
+        sequences = [_U32.pack(tx_in.sequence) for tx_in in self.tx_ins]
+        
+        # Inputs với scriptSig rỗng (VarInt độ dài = 0)
+        empty_ins = [outpoint + b'\x00' + sequence for outpoint, sequence in zip(outpoints, sequences)]
+        suffix = self._serialize_outputs() + _LOCKTIME_SIGHASH.pack(self.locktime, SIGHASH_ALL)
+        
+        # tails[i] là slice (không copy) của một buffer chung
+        body = memoryview(b''.join(empty_ins) + suffix)
+        tails = []
+        offset = 0
+        for empty_in in empty_ins:
+            tails.append(body[offset:])
+            offset += len(empty_in)
+        tails.append(body[offset:])
+        
+        # Checkpoint state trước mỗi input
+        midstates = []
+        h = _sha256(_U32.pack(self.version) + encode_varint(len(self.tx_ins)))
+        for empty_in in empty_ins:
+            midstates.append(h.copy())
+            h.update(empty_in)
+        
+        self._sighash_cache = (midstates, outpoints, sequences, tails)
+        return self._sighash_cache
 
     def is_coinbase(self) -> bool:
         """
@@ -458,9 +742,78 @@ class Tx:
             'is_coinbase': self.is_coinbase()
         }
 
+    def to_json_bytes(self) -> bytes:
+        """
+        Encode transaction thành JSON bytes (cùng nội dung với to_dict()).
+        
+        Với orjson, script cmds (Script.dict_cmds(), đã cache) được đưa thẳng
+        vào encoder thay vì copy list cho từng input/output như to_dict().
+        Không có orjson thì fallback về json.dumps(to_dict()).
+        """
+        if orjson is None:
+            return json.dumps(self.to_dict(), separators=(',', ':')).encode('utf-8')
+        
+        return orjson.dumps({
+            'txid': self.id(),
+            'version': self.version,
+            'tx_ins': [
+                {
+                    'prev_tx': tx_in.prev_tx,
+                    'prev_index': tx_in.prev_index,
+                    'script_sig': tx_in.script_sig.dict_cmds(),
+                    'sequence': tx_in.sequence
+                }
+                for tx_in in self.tx_ins
+            ],
+            'tx_outs': [
+                {
+                    'amount': tx_out.amount,
+                    'script_pubkey': tx_out.script_pubkey.dict_cmds()
+                }
+                for tx_out in self.tx_outs
+            ],
+            'locktime': self.locktime,
+            'is_coinbase': self.is_coinbase()
+        }, default=_json_default)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Tx':
+        """
+        Tạo transaction từ dictionary (ngược lại với to_dict).
+        
+        Script commands giữ nguyên dạng hex string / opcode string.
+        """
+        tx_ins = [
+            TxIn(
+                prev_tx=tx_in['prev_tx'],
+                prev_index=int(tx_in['prev_index']),
+                script_sig=Script(list(tx_in.get('script_sig', []))),
+                sequence=int(tx_in.get('sequence', DEFAULT_SEQUENCE))
+            )
+            for tx_in in data.get('tx_ins', [])
+        ]
+        tx_outs = [
+            TxOut(
+                amount=int(tx_out['amount']),
+                script_pubkey=Script(list(tx_out.get('script_pubkey', [])))
+            )
+            for tx_out in data.get('tx_outs', [])
+        ]
+        # Coinbase (1 input đặc biệt) -> CoinbaseTx
+        if cls is Tx and len(tx_ins) == 1 and tx_ins[0].is_coinbase():
+            cls = CoinbaseTx
+        return cls(
+            version=int(data.get('version', 1)),
+            tx_ins=tx_ins,
+            tx_outs=tx_outs,
+            locktime=int(data.get('locktime', 0))
+        )
+
     def total_output_amount(self) -> int:
-        """Tính tổng số satoshis của tất cả outputs."""
-        return sum(tx_out.amount for tx_out in self.tx_outs)
+        """Tính tổng số satoshis của tất cả outputs (cache sau lần đầu)."""
+        if self._total_output is None:
+            self._total_output = sum(map(_get_amount, self.tx_outs))
+        return self._total_output
 
     @classmethod
     def create_coinbase(
@@ -483,7 +836,7 @@ class Tx:
             height: Block height (dùng trong scriptSig theo BIP34)
             
         Returns:
-            Tx: Coinbase transaction
+            CoinbaseTx: Coinbase transaction
             
         Example:
             >>> script = Script(['OP_DUP', 'OP_HASH160', pubkey_hash, 'OP_EQUALVERIFY', 'OP_CHECKSIG'])
@@ -508,7 +861,54 @@ class Tx:
         # Output gửi reward cho miner
         tx_out = TxOut(amount=amount, script_pubkey=script_pubkey)
         
-        return cls(version=1, tx_ins=[tx_in], tx_outs=[tx_out], locktime=0)
+        return CoinbaseTx(version=1, tx_ins=[tx_in], tx_outs=[tx_out], locktime=0)
+
+
+# =============================================================================
+# COINBASE TX CLASS
+# =============================================================================
+
+class CoinbaseTx(Tx):
+    """
+    Coinbase transaction - transaction đầu tiên của block.
+    
+    Được tạo bởi Tx.create_coinbase() / Tx.from_dict(), nên is_coinbase()
+    trả về hằng True thay vì kiểm tra lại input (so sánh chuỗi prev_tx).
+    """
+    __slots__ = []
+
+    def is_coinbase(self) -> bool:
+        """Luôn là coinbase."""
+        return True
+
+    def serialize(self) -> bytes:
+        """
+        Serialize coinbase (1 input, 1 output) không qua vòng lặp.
+
+        Input/output count đều là VarInt 0x01, nên chỉ cần ghép các phần
+        cố định. Tx có shape khác (vd. sửa tx_outs sau khi tạo) thì dùng
+        Tx.serialize() chung.
+        """
+        if self._serialized is not None:
+            return self._serialized
+        if len(self.tx_ins) != 1 or len(self.tx_outs) != 1:
+            return Tx.serialize(self)
+
+        tx_in = self.tx_ins[0]
+        tx_out = self.tx_outs[0]
+        script_sig = tx_in.script_sig.serialize()
+        script_pubkey = tx_out.script_pubkey.serialize()
+
+        self._serialized = b''.join((
+            _COINBASE_HEAD.pack(self.version, 1, tx_in.prev_tx_le, tx_in.prev_index),
+            encode_varint(len(script_sig)),
+            script_sig,
+            _COINBASE_MID.pack(tx_in.sequence, 1, tx_out.amount),
+            encode_varint(len(script_pubkey)),
+            script_pubkey,
+            _U32.pack(self.locktime)
+        ))
+        return self._serialized
 
 
 # =============================================================================
@@ -38,7 +38,10 @@ class Block:
         Blocksize: Kích thước tính bằng bytes
         Blockheader: BlockHeader object hoặc dict
         Txcount: Số lượng transactions
-        Txs: Danh sách transactions (as dicts)
+        Txs: Danh sách transactions (Tx objects hoặc dicts)
+    
+    Tx objects (đã có __slots__) được giữ nguyên trong block, chỉ chuyển
+    sang dict ở to_dict() khi cần JSON / ghi database.
     """
     
     __slots__ = ['Height', 'Blocksize', 'Blockheader', 'Txcount', 'Txs']
@@ -49,7 +52,7 @@ class Block:
         Blocksize: int, 
         Blockheader: Any, 
         Txcount: int, 
-        Txs: List[Dict[str, Any]]
+        Txs: List[Any]
     ):
         """
         Khởi tạo Block.
@@ -59,7 +62,7 @@ class Block:
             Blocksize: Size in bytes
             Blockheader: BlockHeader object hoặc dict
             Txcount: Number of transactions
-            Txs: List of transactions as dicts
+            Txs: List of transactions (Tx objects hoặc dicts)
         """
         self.Height = Height
         self.Blocksize = Blocksize
@@ -89,7 +92,7 @@ class Block:
             'Blocksize': self.Blocksize,
             'Blockheader': header_dict,
             'Txcount': self.Txcount,
-            'Txs': self.Txs
+            'Txs': [tx.to_dict() if hasattr(tx, 'to_dict') else tx for tx in self.Txs]
         }
     
     def get_hash(self) -> Optional[str]:
@@ -20,14 +20,14 @@ import sys
 import os
 import time
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 # Add parent directory for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.block import Block
 from core.blockheader import BlockHeader
-from core.Tx import Tx, TxIn, TxOut, Script
+from core.Tx import Tx, CoinbaseTx, TxIn, TxOut, Script
 from core.database.database import BlockchainDB, UTXOSet
 from core.mempool import mempool
 from util.util import hash256
@@ -64,6 +64,35 @@ DIFFICULTY_ADJUSTMENT_INTERVAL = 10      # Điều chỉnh sau mỗi 10 blocks
 TARGET_BLOCK_TIME = 60                   # Mục tiêu 1 phút/block
 MAX_TARGET = 0x0000ffff00000000000000000000000000000000000000000000000000000000
 
+# Thời gian mong đợi cho một chu kỳ điều chỉnh (giây)
+EXPECTED_ADJUSTMENT_TIME = DIFFICULTY_ADJUSTMENT_INTERVAL * TARGET_BLOCK_TIME
+
+# Giới hạn actual_time khi điều chỉnh (min 0.25x, max 4x)
+_MIN_ACTUAL_TIME = EXPECTED_ADJUSTMENT_TIME // 4
+_MAX_ACTUAL_TIME = EXPECTED_ADJUSTMENT_TIME * 4
+
+# Điều chỉnh difficulty kiểu ASERT (mỗi block, neo vào genesis) thay cho
+# điều chỉnh theo chu kỳ. Thay đổi consensus -> mặc định tắt, chỉ bật cho
+# mạng thử nghiệm mà mọi node đều dùng cùng cấu hình
+USE_ASERT_DIFFICULTY = False
+ASERT_HALF_LIFE = EXPECTED_ADJUSTMENT_TIME   # Lệch 1 half-life -> target x2 (hoặc /2)
+
+# Lệnh P2PKH placeholder cho output coinbase (tuple: không sửa được,
+# mỗi coinbase tạo Script riêng từ đây)
+_PLACEHOLDER_P2PKH_CMDS = (
+    'OP_DUP',
+    'OP_HASH160',
+    '00' * 20,  # Placeholder: thay bằng miner's pubkey hash thực
+    'OP_EQUALVERIFY',
+    'OP_CHECKSIG'
+)
+
+# Message trong coinbase scriptSig
+_COINBASE_MSG_FMT = "Block {} reward".format
+
+# Reward theo số lần halving (0..63), index 64 = 0 (sau 64 halvings)
+_BLOCK_REWARDS = tuple(INITIAL_SUBSIDY >> i for i in range(64)) + (0,)
+
 
 # =============================================================================
 # BLOCKCHAIN CLASS
@@ -88,14 +117,29 @@ class Blockchain:
         blockchain.main()  # Bắt đầu mining loop
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        db: Optional[BlockchainDB] = None,
+        utxo_set: Optional[UTXOSet] = None
+    ):
         """
         Khởi tạo Blockchain.
         
         Nếu database rỗng, tự động tạo Genesis block.
+        
+        Args:
+            db: BlockchainDB dùng chung (vd. của API server), mặc định tạo mới
+            utxo_set: UTXOSet dùng chung, mặc định tạo mới
         """
-        self.db = BlockchainDB()
-        self.utxo_set = UTXOSet()
+        self.db = db if db is not None else BlockchainDB()
+        self.utxo_set = utxo_set if utxo_set is not None else UTXOSet()
+        
+        # (height, timestamp) của block bắt đầu chu kỳ difficulty hiện tại,
+        # ghi lại khi add_block() để calculate_next_bits() không phải đọc DB
+        self._retarget_cache: Tuple[int, int] = (-1, 0)
+        
+        # (height, timestamp, target) của block neo cho ASERT (genesis)
+        self._asert_anchor: Optional[Tuple[int, int, int]] = None
         
         # Kiểm tra và tạo Genesis block nếu cần
         last_block = self.db.lastBlock()
@@ -103,7 +147,7 @@ class Blockchain:
             logger.info("No blocks found. Creating Genesis block...")
             self._create_genesis_block()
         else:
-            logger.info(f"Blockchain loaded. Last block height: {last_block['Height']}")
+            logger.info("Blockchain loaded. Last block height: %s", last_block['Height'])
     
     # =========================================================================
     # GENESIS BLOCK
@@ -130,7 +174,8 @@ class Blockchain:
     # BLOCK REWARD CALCULATION
     # =========================================================================
     
-    def calculate_block_reward(self, block_height: int) -> int:
+    @staticmethod
+    def calculate_block_reward(block_height: int) -> int:
         """
         Tính block reward dựa trên height.
         
@@ -148,14 +193,8 @@ class Blockchain:
         Returns:
             int: Block reward in satoshis
         """
-        halvings = block_height // HALVING_INTERVAL
-        
-        # Sau 64 halvings, reward = 0 (do right shift)
-        if halvings >= 64:
-            return 0
-        
-        reward = INITIAL_SUBSIDY >> halvings
-        return reward
+        # Tra bảng dựng sẵn; sau 64 halvings reward = 0
+        return _BLOCK_REWARDS[min(block_height // HALVING_INTERVAL, 64)]
     
     # =========================================================================
     # COINBASE TRANSACTION
@@ -174,13 +213,13 @@ class Blockchain:
             block_height: Height của block chứa transaction này
             
         Returns:
-            Tx: Coinbase transaction object
+            CoinbaseTx: Coinbase transaction object
         """
         # Tính reward (có thể cộng thêm fees từ mempool)
         reward = self.calculate_block_reward(block_height)
         
         # Tạo ScriptSig chứa block height và message
-        coinbase_message = f"Block {block_height} reward".encode('utf-8')
+        coinbase_message = _COINBASE_MSG_FMT(block_height).encode('utf-8')
         script_sig = Script([
             block_height.to_bytes(4, 'little'),  # Block height (BIP34)
             len(coinbase_message).to_bytes(1, 'little'),
@@ -195,20 +234,11 @@ class Blockchain:
             sequence=0xffffffff
         )
         
-        # Miner's P2PKH script (placeholder address)
-        script_pubkey = Script([
-            'OP_DUP',
-            'OP_HASH160',
-            '00' * 20,  # Placeholder: thay bằng miner's pubkey hash thực
-            'OP_EQUALVERIFY',
-            'OP_CHECKSIG'
-        ])
-        
-        # Output gửi reward cho miner
-        tx_out = TxOut(amount=reward, script_pubkey=script_pubkey)
+        # Output gửi reward cho miner (P2PKH placeholder)
+        tx_out = TxOut(amount=reward, script_pubkey=Script(list(_PLACEHOLDER_P2PKH_CMDS)))
         
         # Tạo transaction
-        coinbase_tx = Tx(
+        coinbase_tx = CoinbaseTx(
             version=1,
             tx_ins=[tx_in],
             tx_outs=[tx_out],
@@ -216,8 +246,8 @@ class Blockchain:
         )
         
         logger.info(
-            f"Created coinbase for block {block_height}: "
-            f"reward = {reward / 10**8:.8f} BTC"
+            "Created coinbase for block %s: reward = %.8f BTC",
+            block_height, reward / 10**8
         )
         
         return coinbase_tx
@@ -234,7 +264,12 @@ class Blockchain:
         - Tính thời gian thực tế để mine 10 blocks cuối
         - So sánh với thời gian mong đợi (10 * TARGET_BLOCK_TIME)
         - Điều chỉnh target (bits) tương ứng (nhưng không vượt quá MAX_TARGET)
+        
+        Khi USE_ASERT_DIFFICULTY bật thì dùng calculate_asert_bits().
         """
+        if USE_ASERT_DIFFICULTY:
+            return self.calculate_asert_bits(last_block)
+        
         height = last_block['Height']
         current_bits = last_block['Blockheader']['bits']
         
@@ -242,41 +277,86 @@ class Blockchain:
         if (height + 1) % DIFFICULTY_ADJUSTMENT_INTERVAL != 0:
             return current_bits
             
-        # Lấy block bắt đầu chu kỳ
+        # Lấy timestamp block bắt đầu chu kỳ (cache từ add_block, nếu không có thì đọc DB)
         first_block_height = height - (DIFFICULTY_ADJUSTMENT_INTERVAL - 1)
-        first_block = self.db.get_block_by_height(first_block_height)
-        
-        if not first_block:
-            return current_bits
+        cached_height, first_timestamp = self._retarget_cache
+        if cached_height != first_block_height:
+            first_block = self.db.get_block_by_height(first_block_height)
+            if not first_block:
+                return current_bits
+            first_timestamp = first_block['Blockheader']['timestamp']
+            self._retarget_cache = (first_block_height, first_timestamp)
             
         # Tính thời gian thực tế
-        actual_time = last_block['Blockheader']['timestamp'] - first_block['Blockheader']['timestamp']
-        expected_time = DIFFICULTY_ADJUSTMENT_INTERVAL * TARGET_BLOCK_TIME
+        actual_time = last_block['Blockheader']['timestamp'] - first_timestamp
+        expected_time = EXPECTED_ADJUSTMENT_TIME
         
         # Tránh biến động quá lớn (max 4x hoặc min 0.25x)
-        if actual_time < expected_time // 4:
-            actual_time = expected_time // 4
-        if actual_time > expected_time * 4:
-            actual_time = expected_time * 4
+        actual_time = min(max(actual_time, _MIN_ACTUAL_TIME), _MAX_ACTUAL_TIME)
             
         # Điều chỉnh target
         current_target = BlockHeader.bits_to_target(current_bits)
         new_target = (current_target * actual_time) // expected_time
         
         # Giới hạn target
-        if new_target > MAX_TARGET:
-            new_target = MAX_TARGET
+        new_target = min(new_target, MAX_TARGET)
             
         new_bits = BlockHeader.target_to_bits(new_target)
-        logger.info(f"Difficulty adjusted: {current_bits} -> {new_bits} (Actual: {actual_time}s, Expected: {expected_time}s)")
+        logger.info(
+            "Difficulty adjusted: %s -> %s (Actual: %ss, Expected: %ss)",
+            current_bits, new_bits, actual_time, expected_time
+        )
         
         return new_bits
     
+    def calculate_asert_bits(self, last_block: Dict[str, Any]) -> str:
+        """
+        Tính difficulty cho block tiếp theo theo ASERT (aserti3-2d).
+        
+        target = anchor_target * 2^((thời gian thực - thời gian lý tưởng) / ASERT_HALF_LIFE)
+        
+        Chỉ cần height/timestamp của block cuối và block neo (genesis, đọc
+        DB một lần rồi cache), không cần block đầu chu kỳ. 2^x được tính
+        bằng số nguyên: phần nguyên là phép shift, phần lẻ xấp xỉ bằng đa
+        thức bậc 3 (fixed-point 16 bit) như trong aserti3-2d.
+        """
+        if self._asert_anchor is None:
+            anchor = self.db.get_block_by_height(0)
+            if not anchor:
+                return last_block['Blockheader']['bits']
+            anchor_target = min(BlockHeader.bits_to_target(anchor['Blockheader']['bits']), MAX_TARGET)
+            self._asert_anchor = (0, anchor['Blockheader']['timestamp'], anchor_target)
+        anchor_height, anchor_timestamp, anchor_target = self._asert_anchor
+        
+        time_delta = last_block['Blockheader']['timestamp'] - anchor_timestamp
+        height_delta = last_block['Height'] - anchor_height
+        
+        # Số mũ dạng fixed-point 16 bit. Neo là timestamp của chính genesis
+        # (không phải block cha của neo như aserti3-2d) nên thời gian lý
+        # tưởng là height_delta block, không phải height_delta + 1
+        exponent = ((time_delta - TARGET_BLOCK_TIME * height_delta) * 65536) // ASERT_HALF_LIFE
+        num_shifts = exponent >> 16
+        frac = exponent - num_shifts * 65536
+        
+        # 2^frac (frac trong [0, 1)) * 65536
+        factor = ((195766423245049 * frac + 971821376 * frac ** 2 + 5127 * frac ** 3 + 2 ** 47) >> 48) + 65536
+        
+        new_target = anchor_target * factor
+        if num_shifts < 0:
+            new_target >>= -num_shifts
+        else:
+            new_target <<= num_shifts
+        new_target >>= 16
+        
+        # Giới hạn target trong [1, MAX_TARGET]
+        new_target = min(max(new_target, 1), MAX_TARGET)
+        return BlockHeader.target_to_bits(new_target)
+    
     # =========================================================================
     # ADD BLOCK
     # =========================================================================
     
-    def add_block(self, block_height: int, previous_hash: str, bits: Optional[str] = None) -> None:
+    def add_block(self, block_height: int, previous_hash: str, bits: Optional[str] = None) -> Dict[str, Any]:
         """
         Tạo và thêm block mới vào blockchain.
         
@@ -291,8 +371,13 @@ class Blockchain:
         Args:
             block_height: Height cho block mới
             previous_hash: Hash của block trước
+            bits: Difficulty, mặc định tính từ block cuối trong DB
+            
+        Returns:
+            Dict: Block vừa ghi, cùng format với fetch_last_block() (chỉ gồm
+            Height và các field Blockheader mà main()/calculate_next_bits dùng)
         """
-        logger.info(f"Creating block {block_height}...")
+        logger.info("Creating block %s...", block_height)
         
         timestamp = int(time.time())
         
@@ -304,7 +389,7 @@ class Blockchain:
         transactions = [coinbase_tx] + mempool_txs
         
         # 3. Tính Merkle root
-        tx_hashes = [tx.id() for tx in transactions]
+        tx_hashes = Tx.batch_ids(transactions)
         merkle_root = self._calculate_merkle_root(tx_hashes)
         
         # 4. Xác định difficulty (bits)
@@ -322,7 +407,7 @@ class Blockchain:
         )
         
         # 5. Mining
-        logger.info(f"Mining block {block_height}...")
+        logger.info("Mining block %s...", block_height)
         blockheader.mine()
         
         # 6. Tạo block object
@@ -331,21 +416,34 @@ class Blockchain:
             Blocksize=0,  # Simplified
             Blockheader=blockheader,
             Txcount=len(transactions),
-            Txs=[tx.to_dict() for tx in transactions]
+            Txs=transactions
         )
         
         # 7. Ghi vào database
         self._write_block(block)
         
-        logger.info(f"Block {block_height} added successfully")
+        # Block bắt đầu chu kỳ difficulty mới -> nhớ timestamp cho lần retarget sau
+        if block_height % DIFFICULTY_ADJUSTMENT_INTERVAL == 0:
+            self._retarget_cache = (block_height, blockheader.timestamp)
+        
+        logger.info("Block %s added successfully", block_height)
+        
+        return {
+            'Height': block_height,
+            'Blockheader': {
+                'blockhash': blockheader.block_hash,
+                'bits': blockheader.bits,
+                'timestamp': blockheader.timestamp
+            }
+        }
     
     def _calculate_merkle_root(self, tx_hashes: List[str]) -> str:
         if not tx_hashes:
             return ZERO_HASH
         
-        from util.merkle_tree import MerkleTree
-        mt = MerkleTree(tx_hashes)
-        return mt.get_root()
+        # Chỉ cần root -> không dựng cả cây như MerkleTree
+        from util.merkle_tree import merkle_root
+        return merkle_root(tx_hashes)
     
     def _write_block(self, block: Block) -> None:
         """
@@ -354,7 +452,20 @@ class Blockchain:
         block_dict = block.to_dict()
         self.db.write(block_dict)
         
-        # Cập nhật UTXO Set
+        # Cập nhật UTXO Set (một lần đọc + một lần ghi file cho cả block)
+        with self.utxo_set.batch():
+            self._update_utxo_set(block_dict)
+
+        logger.info("Block %s written to database and UTXO set updated", block.Height)
+    
+    def _update_utxo_set(self, block_dict: Dict[str, Any]) -> None:
+        """Áp dụng inputs (xóa UTXO đã chi) và outputs (UTXO mới) của block."""
+        # Log từng UTXO chỉ khi bật DEBUG (kiểm tra một lần cho cả block)
+        log_utxo = logger.isEnabledFor(logging.DEBUG)
+        remove_utxo = self.utxo_set.remove_utxo
+        add_utxo = self.utxo_set.add_utxo
+        
+        # Một lượt qua mỗi tx: inputs rồi outputs
         for tx_dict in block_dict.get('Txs', []):
             tx_id = tx_dict.get('txid')  # Giả sử block.to_dict đã bao gồm txid
             # Nếu chưa có txid (do to_dict chưa chuẩn), ta cần tính lại hoặc tin tưởng nó có
@@ -365,8 +476,9 @@ class Blockchain:
                 for tx_in in tx_dict.get('tx_ins', []):
                     prev_tx = tx_in.get('prev_tx')
                     prev_index = tx_in.get('prev_index')
-                    self.utxo_set.remove_utxo(prev_tx, prev_index)
-                    logger.debug(f"Spent UTXO {prev_tx}:{prev_index}")
+                    remove_utxo(prev_tx, prev_index)
+                    if log_utxo:
+                        logger.debug("Spent UTXO %s:%s", prev_tx, prev_index)
 
             # 2. Outputs: Add new UTXOs
             for i, tx_out in enumerate(tx_dict.get('tx_outs', [])):
@@ -382,12 +494,11 @@ class Blockchain:
                 # Lưu ý: block.to_dict() hiện tại của `Block` class gọi `tx.to_dict()`
                 # `Tx.to_dict` trong Tx.py class có trả về `txid`.
                 if tx_id:
-                    self.utxo_set.add_utxo(tx_id, i, amount, addr, script)
-                    logger.debug(f"Added UTXO {tx_id}:{i} for {addr}")
+                    add_utxo(tx_id, i, amount, addr, script)
+                    if log_utxo:
+                        logger.debug("Added UTXO %s:%s for %s", tx_id, i, addr)
                 else:
                     logger.error("Transaction missing ID in block data")
-
-        logger.info(f"Block {block.Height} written to database and UTXO set updated")
     
     # =========================================================================
     # FETCH BLOCKS
@@ -476,10 +587,15 @@ class Blockchain:
         """
         logger.info("Starting mining loop...")
         
+        # Block cuối giữ trong bộ nhớ: chỉ đọc DB lần đầu và sau khi có lỗi,
+        # các vòng sau dùng block mà add_block() vừa ghi
+        last_block = None
+        
         while True:
             try:
                 # Lấy block cuối
-                last_block = self.fetch_last_block()
+                if last_block is None:
+                    last_block = self.fetch_last_block()
                 
                 if last_block is None:
                     logger.error("No blocks in chain. This shouldn't happen.")
@@ -488,16 +604,19 @@ class Blockchain:
                 # Tính toán cho block tiếp theo
                 new_height = last_block['Height'] + 1
                 prev_hash = last_block['Blockheader']['blockhash']
+                bits = self.calculate_next_bits(last_block)
                 
                 # Tạo block mới
-                self.add_block(new_height, prev_hash)
+                last_block = self.add_block(new_height, prev_hash, bits)
                 
             except KeyboardInterrupt:
                 logger.info("Mining stopped by user")
                 break
                 
             except Exception as e:
-                logger.error(f"Error in mining loop: {e}")
+                logger.error("Error in mining loop: %s", e)
+                # Không chắc block đã được ghi hay chưa -> đọc lại từ DB
+                last_block = None
                 # Đợi một chút trước khi thử lại
                 time.sleep(1)
 
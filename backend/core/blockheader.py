@@ -23,10 +23,12 @@ Cấu trúc Block Header (80 bytes):
 └──────────────────────────────────────────┘
 """
 import time
+import struct
 import logging
 from typing import Optional
 
 from util.util import hash256
+from util.mining import HAS_NUMBA, mine_range_parallel
 
 
 # =============================================================================
@@ -46,6 +48,13 @@ DEFAULT_BITS = '1d00ffff'
 # Mining progress report interval
 MINING_REPORT_INTERVAL = 100000  # Báo cáo mỗi 100k hashes
 
+# Không gian nonce (4 bytes) và số nonce mỗi task gửi cho worker process
+MAX_NONCE = 0xFFFFFFFF
+MINING_CHUNK_SIZE = 1_000_000
+
+# Header prefix 76 bytes: version, prev hash, merkle root, timestamp, bits
+_PREFIX_STRUCT = struct.Struct('<I32s32sI4s')
+
 
 # =============================================================================
 # BLOCKHEADER CLASS
@@ -109,7 +118,7 @@ class BlockHeader:
         self.block_hash: Optional[str] = None
         
         # Pre-compute header prefix (không đổi trong quá trình mining)
-        self._header_prefix: Optional[str] = None
+        self._header_prefix: Optional[bytes] = None
     
     # =========================================================================
     # CALCULATION METHODS
@@ -135,123 +144,63 @@ class BlockHeader:
         target = self.calculate_target()
         header_prefix = self._serialize_prefix()
         
+        # Có numba: một lời gọi trong process, kernel tự chia khoảng nonce
+        # cho các thread (prange) -> không cần Pool, không fork/pickle
+        if HAS_NUMBA:
+            found_nonce = mine_range_parallel(header_prefix, target, 0, MAX_NONCE + 1)
+            if found_nonce is None:
+                return None
+            header = header_prefix + found_nonce.to_bytes(4, 'little')
+            return self._finish_mining(found_nonce, hash256(header)[::-1].hex(), start_time)
+        
         # Determine number of processes (leave 1 core free)
         import multiprocessing
         num_processes = max(1, multiprocessing.cpu_count() - 1)
         
-        # Chunk size for each process
-        chunk_size = 1_000_000
-        max_nonce = 4_294_967_295
+        # Chia toàn bộ [0, MAX_NONCE] thành các chunk MINING_CHUNK_SIZE nonce
+        # (chunk cuối ngắn hơn) -> không sót nonce nào ở cuối khoảng.
+        # Worker xong chunk nào thì nhận chunk kế tiếp; main process chờ kết
+        # quả qua imap_unordered (block, không polling) và dừng Pool ngay
+        # khi có chunk tìm được nonce.
+        tasks = (
+            (header_prefix, target, r_start, min(r_start + MINING_CHUNK_SIZE, MAX_NONCE + 1))
+            for r_start in range(0, MAX_NONCE + 1, MINING_CHUNK_SIZE)
+        )
         
         found_nonce = None
         found_hash = None
         
         with multiprocessing.Pool(processes=num_processes) as pool:
-            # Create tasks specific ranges for each worker
-            # We submit batches to avoid creating too many tasks
-            
-            ctx = multiprocessing.get_context('spawn') # Safer for Windows usually, but let's trust default or 'spawn'
-            
-            # Simple approach: Each worker takes a Step
-            # worker i checks nonces: i, i+step, i+2*step...
-            # But Python mp is easier with distinct ranges
-            
-            results = []
-            for i in range(num_processes):
-                # We simply let workers run randomized or stepped ranges.
-                # Simplest for this demo: 
-                # Worker 0: 0 - 1B
-                # Worker 1: 1B - 2B ...
-                r_start = i * (max_nonce // num_processes)
-                r_end = (i + 1) * (max_nonce // num_processes)
-                results.append(pool.apply_async(_mine_worker, (header_prefix, target, r_start, r_end)))
-            
             try:
-                # Wait for FIRST success
-                while True:
-                    all_done = True
-                    for res in results:
-                        if not res.ready():
-                            all_done = False
-                            continue
-                        
-                        val = res.get()
-                        if val: # Found!
-                            found_nonce, found_hash = val
-                            pool.terminate()
-                            break
-                    
-                    if found_nonce is not None:
+                for val in pool.imap_unordered(_mine_chunk, tasks):
+                    if val:  # Found!
+                        found_nonce, found_hash = val
                         break
-                        
-                    if all_done:
-                        break
-                    
-                    time.sleep(0.5)
             except KeyboardInterrupt:
+                pass
+            finally:
                 pool.terminate()
                 
         if found_nonce is not None:
-            self.nonce = found_nonce
-            self.block_hash = found_hash
-            elapsed = time.time() - start_time
-            hashrate = self.nonce / elapsed if elapsed > 0 else 0
-            
-            logger.info(f"Block mined successfully!")
-            logger.info(f"  Hash: {self.block_hash}")
-            logger.info(f"  Nonce: {self.nonce}")
-            logger.info(f"  Time: {elapsed:.2f}s")
-            logger.info(f"  Hashrate (effective): {hashrate:.0f} H/s")
-            
-            return self.block_hash
+            return self._finish_mining(found_nonce, found_hash, start_time)
             
         return None
-
-def _mine_worker(header_prefix, target, start_nonce, end_nonce):
-    """Standalone worker function for multiprocessing."""
-    nonce = start_nonce
-    # Optimization: local variable access is faster
-    import hashlib
-    
-    # Pre-parse prefix to bytes
-    prefix_bytes = bytes.fromhex(header_prefix)
     
-    while nonce < end_nonce:
-        # Construct header: prefix + nonce (4 bytes little-endian)
-        # Note: Optimization - manual byte concatenation
-        header = prefix_bytes + nonce.to_bytes(4, 'little')
-        
-        # Double SHA256
-        # digest() returns bytes, simpler to compare integers if we convert
-        h1 = hashlib.sha256(header).digest()
-        h2 = hashlib.sha256(h1).digest()
+    def _finish_mining(self, nonce: int, block_hash: str, start_time: float) -> str:
+        """Lưu nonce/hash tìm được và log thống kê mining."""
+        self.nonce = nonce
+        self.block_hash = block_hash
+        elapsed = time.time() - start_time
+        hashrate = self.nonce / elapsed if elapsed > 0 else 0
         
-        # Convert to int - big-endian because hex string is big-endian representation of the number?
-        # Bitcoin hash check: interpreted as little-endian number? 
-        # Actually: 
-        # hash_hex = h2[::-1].hex() 
-        # hash_int = int(hash_hex, 16)
-        # target is calculated as int 
+        logger.info("Block mined successfully!")
+        logger.info("  Hash: %s", self.block_hash)
+        logger.info("  Nonce: %s", self.nonce)
+        logger.info("  Time: %.2fs", elapsed)
+        logger.info("  Hashrate (effective): %.0f H/s", hashrate)
         
-        # Optimization: Compare bytes directly?
-        # Target is large integer.
-        # Let's stick to standard flow for correctness first
-        
-        hash_hex = h2[::-1].hex()
-        if int(hash_hex, 16) < target:
-            return nonce, hash_hex
-            
-        nonce += 1
-        
-        # Check cancellation? (Hard in simple loop without IPC)
-        # We rely on Process.terminate() from main
-        
-        pass # end while
-        
-    return None
-    
+        return self.block_hash
 
-    
     @staticmethod
     def bits_to_target(bits: str) -> int:
         """
@@ -268,6 +217,8 @@ def _mine_worker(header_prefix, target, start_nonce, end_nonce):
         bits_bytes = bytes.fromhex(bits)
         exponent = bits_bytes[0]
         coefficient = int.from_bytes(bits_bytes[1:], 'big')
+        if exponent >= 3:
+            return coefficient << (8 * (exponent - 3))
         return coefficient * 2**(8*(exponent - 3))
 
     @staticmethod
@@ -295,14 +246,14 @@ def _mine_worker(header_prefix, target, start_nonce, end_nonce):
     # SERIALIZATION METHODS
     # =========================================================================
     
-    def _serialize_prefix(self) -> str:
+    def _serialize_prefix(self) -> bytes:
         """
         Serialize phần header KHÔNG bao gồm nonce.
         
         Dùng để optimization mining - chỉ compute 1 lần,
         sau đó append nonce mỗi iteration.
         
-        Format (76 bytes = 152 hex chars):
+        Format (76 bytes, mọi trường little-endian):
         - Version: 4 bytes
         - Previous block hash: 32 bytes
         - Merkle root: 32 bytes
@@ -310,24 +261,15 @@ def _mine_worker(header_prefix, target, start_nonce, end_nonce):
         - Bits: 4 bytes
         
         Returns:
-            str: Header prefix dạng hex
+            bytes: Header prefix dạng raw bytes (worker dùng trực tiếp)
         """
-        # Version (4 bytes, little-endian)
-        version_hex = self.version.to_bytes(4, 'little').hex()
-        
-        # Previous block hash (32 bytes, little-endian)
-        prev_hash = bytes.fromhex(self.previous_block_hash)[::-1].hex()
-        
-        # Merkle root (32 bytes, little-endian)
-        merkle = bytes.fromhex(self.merkle_root)[::-1].hex()
-        
-        # Timestamp (4 bytes, little-endian)
-        timestamp_hex = self.timestamp.to_bytes(4, 'little').hex()
-        
-        # Bits (4 bytes, little-endian)
-        bits_hex = bytes.fromhex(self.bits)[::-1].hex()
-        
-        return version_hex + prev_hash + merkle + timestamp_hex + bits_hex
+        return _PREFIX_STRUCT.pack(
+            self.version,
+            bytes.fromhex(self.previous_block_hash)[::-1],
+            bytes.fromhex(self.merkle_root)[::-1],
+            self.timestamp,
+            bytes.fromhex(self.bits)[::-1]
+        )
     
     def serialize(self) -> str:
         """
@@ -338,9 +280,7 @@ def _mine_worker(header_prefix, target, start_nonce, end_nonce):
         Returns:
             str: Full header dạng hex
         """
-        header_prefix = self._serialize_prefix()
-        nonce_hex = self.nonce.to_bytes(4, 'little').hex()
-        return header_prefix + nonce_hex
+        return (self._serialize_prefix() + self.nonce.to_bytes(4, 'little')).hex()
     
     def to_dict(self) -> dict:
         """
@@ -364,3 +304,59 @@ def _mine_worker(header_prefix, target, start_nonce, end_nonce):
             f"prev_hash={self.previous_block_hash[:16]}..., "
             f"nonce={self.nonce})"
         )
+
+
+def _mine_chunk(args):
+    """Wrapper một tham số cho Pool.imap_unordered."""
+    return _mine_worker(*args)
+
+
+def _mine_worker(prefix_bytes, target, start_nonce, end_nonce):
+    """Standalone worker function for multiprocessing."""
+    nonce = start_nonce
+    # Optimization: local variable access is faster
+    import hashlib
+    
+    # Midstate: 64 bytes đầu của header không chứa nonce -> hash một lần,
+    # mỗi nonce chỉ copy state và hash tiếp 16 bytes cuối
+    midstate = hashlib.sha256(prefix_bytes[:64])
+    
+    # 16 bytes cuối của header (12 bytes cố định + nonce) trong một buffer
+    # dùng lại, mỗi nonce chỉ ghi đè 4 bytes
+    tail = bytearray(prefix_bytes[64:] + bytes(4))
+    pack_nonce = struct.Struct('<I').pack_into
+    
+    # Target dạng 32 bytes big-endian; target >= 2^256 thì hash nào cũng thỏa
+    # (33 bytes 0xff lớn hơn mọi hash 32 bytes)
+    if target >> 256:
+        target_be = b'\xff' * 33
+    else:
+        target_be = target.to_bytes(32, 'big')
+    
+    # Byte cao nhất của target: hash có byte cao nhất (h2[31]) lớn hơn thì
+    # chắc chắn không thỏa, loại ngay mà không cần đảo cả 32 bytes
+    target_top = target_be[0]
+    
+    while nonce < end_nonce:
+        # Phần còn lại của header: tail + nonce (4 bytes little-endian)
+        pack_nonce(tail, 12, nonce)
+        h = midstate.copy()
+        h.update(tail)
+        
+        # Double SHA256
+        h1 = h.digest()
+        h2 = hashlib.sha256(h1).digest()
+        
+        # Hash là số 256-bit little-endian: đảo thành big-endian rồi so sánh
+        # bytes (cùng độ dài -> thứ tự bytes = thứ tự số), không qua hex/int
+        if h2[31] <= target_top:
+            hash_be = h2[::-1]
+            if hash_be < target_be:
+                return nonce, hash_be.hex()
+            
+        nonce += 1
+        
+        # Không cần kiểm tra cờ hủy: mỗi task chỉ là một chunk ngắn và
+        # main process gọi Pool.terminate() ngay khi có kết quả
+    
+    return None
@@ -13,9 +13,18 @@ Tính năng:
 import os
 import json
 import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterator, Optional, Any, Tuple
+
+try:
+    # orjson (C) - parse/encode JSON nhanh hơn nhiều so với json thuần Python
+    import orjson
+except ImportError:
+    orjson = None
 
 
 # =============================================================================
@@ -32,6 +41,46 @@ logger = logging.getLogger(__name__)
 DEFAULT_FILENAME = 'blockchain.json'
 DEFAULT_BITS = '1d00ffff'
 
+# Format file JSON: write_all() dump cả list với indent này
+# (orjson chỉ hỗ trợ indent 2)
+JSON_INDENT = 2
+
+# Số kết quả tra cứu address/txid tối đa giữ trong cache (LRU)
+LOOKUP_CACHE_MAX_ENTRIES = 1024
+
+
+# =============================================================================
+# JSON HELPERS
+# =============================================================================
+
+def _stat_stamp(st: os.stat_result) -> Tuple[int, int]:
+    """Dấu hiệu thay đổi của file dùng để kiểm tra cache: (mtime_ns, size)."""
+    return st.st_mtime_ns, st.st_size
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON từ bytes (orjson nếu có)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any, indent: int) -> str:
+    """
+    Encode JSON có indent.
+    
+    orjson chỉ dùng được với indent 2; dữ liệu orjson không encode được
+    (vd. int vượt 64-bit) thì fallback về json.
+    """
+    if orjson is not None and indent == 2:
+        try:
+            return orjson.dumps(
+                obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            ).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(obj, indent=indent)
+
 
 # =============================================================================
 # BASE DATABASE CLASS
@@ -52,6 +101,7 @@ class BaseDB:
         filepath: Đường dẫn đầy đủ đến file
         _cache: Cache dữ liệu đã đọc
         _cache_valid: Cache có còn hợp lệ không
+        _cache_stamp: (mtime_ns, size) của file lúc đọc vào cache
     """
     
     def __init__(self, filename: str = DEFAULT_FILENAME):
@@ -74,23 +124,37 @@ class BaseDB:
         # Caching
         self._cache: Optional[List[Dict]] = None
         self._cache_valid = False
+        self._cache_stamp: Optional[Tuple[int, int]] = None
         
         logger.debug(f"Database initialized: {self.filepath}")
 
     def read(self) -> List[Dict[str, Any]]:
         """
         Đọc dữ liệu từ file JSON.
-        """
-        if self._cache_valid and self._cache is not None:
-            return self._cache
         
-        if not self.filepath.exists():
+        Cache chỉ được dùng khi (mtime, size) của file chưa đổi: process
+        khác (CLI, API, miner) ghi vào cùng file thì lần đọc sau load lại.
+        """
+        stamp = self._file_stamp()
+        if stamp is None:
+            if self._cache_valid:
+                self._invalidate_cache()
             return []
         
+        if self._cache_valid and self._cache is not None:
+            if stamp == self._cache_stamp:
+                return self._cache
+            # File bị ghi từ bên ngoài
+            self._invalidate_cache()
+        
         try:
-            with open(self.filepath, 'r', encoding='utf-8') as file:
-                data = json.load(file)
+            with open(self.filepath, 'rb') as file:
+                # Lấy stamp trước khi đọc: ghi chen vào giữa chỉ làm lần
+                # đọc sau load lại, không bao giờ giữ cache cũ
+                stamp = _stat_stamp(os.fstat(file.fileno()))
+                data = _json_loads(file.read())
                 self._cache = data
+                self._cache_stamp = stamp
                 self._cache_valid = True
                 return data
         except Exception as e:
@@ -103,7 +167,7 @@ class BaseDB:
         """
         try:
             with open(self.filepath, 'w', encoding='utf-8') as file:
-                json.dump(data, file, indent=4)
+                file.write(_json_dumps(data, JSON_INDENT))
             self._invalidate_cache()
             return True
         except Exception as e:
@@ -114,9 +178,75 @@ class BaseDB:
         """
         Ghi một block mới vào cuối danh sách.
         """
+        return self.write_many([block_data])
+    
+    def write_many(self, items: List[Dict[str, Any]]) -> bool:
+        """
+        Ghi nhiều block vào cuối danh sách bằng một lần ghi file.
+        
+        File là JSON array do write_all() ghi, nên chỉ cần ghi đè "]" cuối
+        file bằng ",<item>,<item>...]" (cùng indent với các item đã có trong
+        file) thay vì encode và ghi lại toàn bộ các block cũ. Cache trong bộ
+        nhớ được extend theo, không phải đọc lại file.
+        """
+        if not items:
+            return True
+        
         blocks = self.read()
-        blocks.append(block_data)
-        return self.write_all(blocks)
+        if not blocks:
+            blocks.extend(items)
+            return self.write_all(blocks)
+        
+        try:
+            with open(self.filepath, 'r+b') as file:
+                # File đổi từ sau lần read() ở trên (process khác vừa ghi)
+                # -> vẫn append đúng cuối file, nhưng cache phải load lại
+                cache_fresh = _stat_stamp(os.fstat(file.fileno())) == self._cache_stamp
+                
+                # Indent của file: số space trước item đầu ("[\n  {...")
+                # -> file cũ ghi với indent khác vẫn giữ nguyên format
+                head = file.read(16)[1:].lstrip(b'\r\n')
+                indent = len(head) - len(head.lstrip(b' '))
+                
+                file.seek(-3, os.SEEK_END)
+                tail = file.read()
+                appended = tail[-2:] == b'\n]' and indent > 0
+                if appended:
+                    # write_all mở file ở text mode: newline là '\r\n' trên Windows
+                    newline = '\r\n' if tail == b'\r\n]' else '\n'
+                    item_newline = newline + ' ' * indent
+                    chunk = ''.join(
+                        ',' + item_newline
+                        + _json_dumps(item, indent).replace('\n', item_newline)
+                        for item in items
+                    )
+                    
+                    file.seek(-(len(newline) + 1), os.SEEK_END)
+                    file.write((chunk + newline + ']').encode('utf-8'))
+                    file.flush()
+                    new_stamp = _stat_stamp(os.fstat(file.fileno()))
+        except Exception as e:
+            logger.error(f"Error writing to database: {e}")
+            return False
+        
+        if not appended:
+            # Không phải format của write_all -> ghi lại cả file
+            blocks.extend(items)
+            return self.write_all(blocks)
+        
+        if cache_fresh:
+            blocks.extend(items)
+            self._cache_stamp = new_stamp
+        else:
+            self._invalidate_cache()
+        return True
+    
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) hiện tại của file, None nếu file không tồn tại."""
+        try:
+            return _stat_stamp(os.stat(self.filepath))
+        except FileNotFoundError:
+            return None
     
     def _invalidate_cache(self) -> None:
         """Đánh dấu cache không còn hợp lệ."""
@@ -135,12 +265,32 @@ class BlockchainDB(BaseDB):
     Kế thừa BaseDB và thêm các method:
     - lastBlock(): Lấy block cuối cùng
     - get_block_by_height(): Lấy block theo height
+    - get_transactions_by_address(): Tra giao dịch theo address (qua index)
+    - iter_transactions_by_address(): Như trên nhưng dạng generator
+    - write_many(): Ghi nhiều block (replay/đồng bộ) trong một lần ghi file
     - clear(): Xóa toàn bộ blockchain
+    
+    Kết quả tra cứu theo address/txid được cache trong bộ nhớ và bị xóa
+    mỗi khi ghi block mới hoặc khi file bị process khác ghi
+    (xem write_many / _invalidate_cache).
+    
+    Một instance có thể được dùng chung giữa nhiều thread (API server,
+    mining worker): index, lookup cache và đường ghi được bảo vệ bởi _lock.
     """
     
     def __init__(self):
         """Khởi tạo BlockchainDB với default filename."""
+        # RLock: các method giữ lock gọi read(), mà read() có thể gọi
+        # _invalidate_cache() (cũng lấy lock)
+        self._lock = threading.RLock()
+        
         super().__init__(filename=DEFAULT_FILENAME)
+        
+        # Cache kết quả query (LRU): ('addr', address) / ('tx', txid) → kết quả
+        self._lookup_cache: 'OrderedDict[tuple, Any]' = OrderedDict()
+        
+        # Secondary index, cập nhật khi ghi block (xem _index_block)
+        self._reset_index()
     
     def lastBlock(self) -> Optional[Dict[str, Any]]:
         """
@@ -177,8 +327,12 @@ class BlockchainDB(BaseDB):
         """
         blocks = self.read()
         
+        # Fast path: block được lưu theo thứ tự height
+        if 0 <= height < len(blocks) and self._block_height(blocks[height]) == height:
+            return self._normalize_block(blocks[height])
+        
         for block in blocks:
-            if int(block.get('Block', -1)) == height:
+            if self._block_height(block) == height:
                 return self._normalize_block(block)
         
         logger.warning(f"Block at height {height} not found")
@@ -187,59 +341,177 @@ class BlockchainDB(BaseDB):
     def get_transactions_by_address(self, address: str) -> List[Dict[str, Any]]:
         """
         Tìm tất cả giao dịch liên quan đến một địa chỉ.
-        """
-        blocks = self.read()
-        history = []
         
-        for block in blocks:
-            height = int(block.get('Block', 0))
-            timestamp = block.get('Timestamp', '')
+        Dùng secondary index address → [(block_pos, tx_pos)] nên chi phí
+        là O(số kết quả) thay vì quét toàn bộ chain.
+        Kết quả khác rỗng được cache cho đến lần ghi block tiếp theo.
+        """
+        with self._lock:
+            self.read()  # File đổi từ bên ngoài -> read() xóa lookup cache
+            cache_key = ('addr', address)
+            history = self._lookup_get(cache_key)
+            if history is not None:
+                return history
             
-            for tx in block.get('Txs', []):
-                # Search in outputs
-                is_relevant = False
-                for output in tx.get('outputs', []):
-                    if address in output:
-                        is_relevant = True
-                        break
-                
-                # Search in inputs (if not coinbase)
-                if not is_relevant and tx.get('type') != 'Coinbase':
-                    for inp in tx.get('inputs', []):
-                        # This part is harder because we don't store sender address directly in DB 
-                        # but we can look for address hash in input markers if we had more info
-                        pass
-                
-                if is_relevant:
-                    history.append({
-                        'txid': tx['txid'],
-                        'type': tx['type'],
-                        'block_height': height,
-                        'timestamp': timestamp,
-                        'outputs': tx['outputs'],
-                        'inputs': tx['inputs']
-                    })
+            history = list(self.iter_transactions_by_address(address))
             
-        return history
+            if history:
+                self._lookup_put(cache_key, history)
+            return history
+    
+    def iter_transactions_by_address(self, address: str) -> Iterator[Dict[str, Any]]:
+        """
+        Như get_transactions_by_address nhưng yield từng giao dịch
+        (không dựng list, không cache) - dùng cho streaming response.
+        """
+        with self._lock:
+            self._ensure_index()
+            blocks = self.read()
+            locations = list(self._addr_index.get(address, []))
+        for block_pos, tx_pos in locations:
+            block = blocks[block_pos]
+            yield self._tx_record(block, block['Txs'][tx_pos])
 
     def get_transaction_by_id(self, txid: str) -> Optional[Dict[str, Any]]:
         """
-        Tìm giao dịch theo TXID.
+        Tìm giao dịch theo TXID (chấp nhận prefix).
+        
+        Kết quả tìm thấy được cache cho đến lần ghi block tiếp theo
+        (không cache miss: txid đến trực tiếp từ request của client).
         """
-        blocks = self.read()
-        for block in blocks:
-            for tx in block.get('Txs', []):
-                if tx['txid'] == txid or tx['txid'].startswith(txid):
-                    return {
-                        'txid': tx['txid'],
-                        'type': tx['type'],
-                        'block_height': int(block.get('Block', 0)),
-                        'timestamp': block.get('Timestamp', ''),
-                        'outputs': tx['outputs'],
-                        'inputs': tx['inputs']
-                    }
+        with self._lock:
+            self.read()  # File đổi từ bên ngoài -> read() xóa lookup cache
+            cache_key = ('tx', txid)
+            result = self._lookup_get(cache_key)
+            if result is not None:
+                return result
+            
+            self._ensure_index()
+            location = self._txid_index.get(txid)
+            if location is None:
+                # Prefix lookup
+                for full_txid, loc in self._txid_index.items():
+                    if full_txid.startswith(txid):
+                        location = loc
+                        break
+            
+            result = None
+            if location is not None:
+                block = self.read()[location[0]]
+                result = self._tx_record(block, block['Txs'][location[1]])
+                self._lookup_put(cache_key, result)
+            return result
+    
+    def write_many(self, items: List[Dict[str, Any]]) -> bool:
+        """
+        Ghi các block mới (một lần ghi file) và cập nhật address/txid index
+        (nếu đã được build).
+        """
+        with self._lock:
+            block_pos = len(self.read())
+            if not super().write_many(items):
+                return False
+            self._lookup_cache.clear()
+            
+            if self._indexed_count == block_pos:
+                for offset, block_data in enumerate(items):
+                    self._index_block(block_pos + offset, block_data)
+            return True
+    
+    def _lookup_get(self, cache_key: tuple) -> Any:
+        """Lấy kết quả từ lookup cache (None nếu chưa có), đánh dấu mới dùng."""
+        result = self._lookup_cache.get(cache_key)
+        if result is not None:
+            self._lookup_cache.move_to_end(cache_key)
+        return result
+    
+    def _lookup_put(self, cache_key: tuple, result: Any) -> None:
+        """Ghi kết quả vào lookup cache, bỏ entry cũ nhất khi vượt giới hạn."""
+        self._lookup_cache[cache_key] = result
+        self._lookup_cache.move_to_end(cache_key)
+        if len(self._lookup_cache) > LOOKUP_CACHE_MAX_ENTRIES:
+            self._lookup_cache.popitem(last=False)
+    
+    # =========================================================================
+    # ADDRESS / TXID INDEX
+    # =========================================================================
+    
+    def _ensure_index(self) -> None:
+        """Build index lazily, chỉ index các block chưa được index."""
+        with self._lock:
+            blocks = self.read()
+            if len(blocks) < self._indexed_count:
+                # File bị thay đổi từ bên ngoài (clear/ghi đè) -> build lại
+                self._reset_index()
+            
+            for block_pos in range(self._indexed_count, len(blocks)):
+                self._index_block(block_pos, blocks[block_pos])
+    
+    def _index_block(self, block_pos: int, block: Dict[str, Any]) -> None:
+        """Thêm các giao dịch của một block vào index."""
+        for tx_pos, tx in enumerate(block.get('Txs', [])):
+            txid = tx.get('txid')
+            location = (block_pos, tx_pos)
+            related = set()
+            
+            # Inputs: tra địa chỉ sở hữu output đã bị chi tiêu
+            if not tx.get('is_coinbase'):
+                for tx_in in tx.get('tx_ins', []):
+                    owner = self._outpoint_owner.get((tx_in.get('prev_tx'), tx_in.get('prev_index')))
+                    if owner:
+                        related.add(owner)
+            
+            # Outputs: địa chỉ nhận tiền
+            for index, tx_out in enumerate(tx.get('tx_outs', [])):
+                addr = self._script_address(tx_out.get('script_pubkey'))
+                if addr:
+                    related.add(addr)
+                    if txid:
+                        self._outpoint_owner[(txid, index)] = addr
+            
+            for addr in related:
+                self._addr_index.setdefault(addr, []).append(location)
+            if txid:
+                self._txid_index[txid] = location
+        
+        self._indexed_count = block_pos + 1
+    
+    def _reset_index(self) -> None:
+        """Xóa toàn bộ index."""
+        self._addr_index: Dict[str, List[Tuple[int, int]]] = {}
+        self._txid_index: Dict[str, Tuple[int, int]] = {}
+        self._outpoint_owner: Dict[Tuple[str, int], str] = {}
+        self._indexed_count = 0
+    
+    @staticmethod
+    def _script_address(script: Any) -> Optional[str]:
+        """Lấy địa chỉ từ P2PKH script_pubkey (dạng list)."""
+        if isinstance(script, list) and len(script) >= 3 and script[0] == 'OP_DUP':
+            return script[2]
         return None
     
+    @staticmethod
+    def _block_height(block: Dict[str, Any]) -> int:
+        """Height của block (format mới: 'Height', format cũ: 'Block')."""
+        return int(block.get('Height', block.get('Block', -1)))
+    
+    @staticmethod
+    def _tx_record(block: Dict[str, Any], tx: Dict[str, Any]) -> Dict[str, Any]:
+        """Chuẩn hóa một giao dịch trong block thành record trả về cho API."""
+        if 'Blockheader' in block:
+            timestamp = block['Blockheader'].get('timestamp', 0)
+        else:
+            timestamp = block.get('Timestamp', '')
+        
+        return {
+            'txid': tx.get('txid'),
+            'type': 'Coinbase' if tx.get('is_coinbase') else 'Transfer',
+            'block_height': BlockchainDB._block_height(block),
+            'timestamp': timestamp,
+            'outputs': tx.get('tx_outs', []),
+            'inputs': tx.get('tx_ins', [])
+        }
+    
     def clear(self) -> bool:
         """
         Xóa toàn bộ blockchain (dùng cho testing).
@@ -248,10 +520,12 @@ class BlockchainDB(BaseDB):
             bool: True nếu xóa thành công
         """
         try:
-            if self.filepath.exists():
-                self.filepath.unlink()  # Xóa file
-            
-            self._invalidate_cache()
+            with self._lock:
+                if self.filepath.exists():
+                    self.filepath.unlink()  # Xóa file
+                
+                self._invalidate_cache()
+                self._reset_index()
             logger.info("Blockchain database cleared")
             return True
             
@@ -259,6 +533,16 @@ class BlockchainDB(BaseDB):
             logger.error(f"Error clearing database: {e}")
             return False
     
+    def _invalidate_cache(self) -> None:
+        """
+        Xóa cache file data, cache kết quả tra cứu và index (file có thể đã
+        bị ghi lại bởi process khác -> index build lại ở lần tra cứu sau).
+        """
+        with self._lock:
+            super()._invalidate_cache()
+            self._lookup_cache.clear()
+            self._reset_index()
+    
     def _normalize_block(self, raw_block: Dict[str, Any]) -> Dict[str, Any]:
         """
         Chuẩn hóa block data về format chuẩn.
@@ -321,13 +605,61 @@ class UTXOSet(BaseDB):
     def __init__(self):
         super().__init__(filename='utxo_set.json')
         
+        # key -> UTXO khi đang trong batch() (None = ghi file ngay mỗi thao tác)
+        self._batch: Optional[Dict[str, Dict[str, Any]]] = None
+        
+        # address -> số dư, dựng từ list UTXO mà read() trả về (_balances_src);
+        # read() trả về list mới sau mỗi lần ghi file nên cache tự hết hạn
+        self._balances: Dict[str, int] = {}
+        self._balances_src: Optional[List[Dict[str, Any]]] = None
+        
+        # UTXO map cho TransactionVerifier, cache theo cùng cơ chế
+        self._utxo_map: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._utxo_map_src: Optional[List[Dict[str, Any]]] = None
+    
+    @contextmanager
+    def batch(self) -> Iterator['UTXOSet']:
+        """
+        Gom các add_utxo()/remove_utxo() bên trong thành một lần đọc file
+        và một lần ghi file (thay vì đọc + ghi lại cả file cho mỗi thao tác).
+        
+        Các thao tác vẫn được áp dụng theo đúng thứ tự gọi, nên tx sau chi
+        tiêu output của tx trước trong cùng block vẫn đúng.
+        
+        Example:
+            with utxo_set.batch():
+                utxo_set.remove_utxo(prev_tx, prev_index)
+                utxo_set.add_utxo(tx_id, 0, amount, address, script)
+        """
+        self._batch = {u['key']: u for u in self.read()}
+        try:
+            yield self
+        finally:
+            utxos = list(self._batch.values())
+            self._batch = None
+            self.write_all(utxos)
+        
     def add_utxo(self, tx_id: str, index: int, amount: int, address: str, script: List[str]):
         """Thêm một UTXO mới."""
-        utxos = self.read()
-        
         # Key unique cho UTXO
         key = f"{tx_id}:{index}"
         
+        if self._batch is not None:
+            if key in self._batch:
+                logger.warning(f"UTXO {key} already exists!")
+                return
+            self._batch[key] = {
+                'key': key,
+                'tx_id': tx_id,
+                'index': index,
+                'amount': amount,
+                'address': address,
+                'script': script
+            }
+            return
+        
+        utxos = self.read()
+        
         # Thêm vào danh sách (dùng dict để dễ lookup)
         # Trong file JSON ta sẽ lưu list, nhưng load lên có thể convert sang dict
         # Ở đây ta giữ thao tác list đơn giản cho BaseDB
@@ -350,9 +682,14 @@ class UTXOSet(BaseDB):
         
     def remove_utxo(self, tx_id: str, index: int):
         """Xóa UTXO khi nó đã được chi tiêu."""
-        utxos = self.read()
         key = f"{tx_id}:{index}"
         
+        if self._batch is not None:
+            if self._batch.pop(key, None) is None:
+                logger.warning(f"Attempted to remove non-existent UTXO {key}")
+            return
+        
+        utxos = self.read()
         original_len = len(utxos)
         utxos = [u for u in utxos if u['key'] != key]
         
@@ -362,15 +699,42 @@ class UTXOSet(BaseDB):
         self.write_all(utxos)
         
     def get_balance(self, address: str) -> int:
-        """Tính tổng số dư từ các UTXO của địa chỉ."""
+        """
+        Tính tổng số dư từ các UTXO của địa chỉ.
+        
+        Số dư của mọi địa chỉ được tính trong một lần quét và cache cho đến
+        lần ghi UTXO set tiếp theo.
+        """
         utxos = self.read()
-        balance = 0
-        for u in utxos:
-            if u['address'] == address:
-                balance += int(u['amount'])
-        return balance
+        if self._balances_src is not utxos:
+            balances: Dict[str, int] = {}
+            for u in utxos:
+                balances[u['address']] = balances.get(u['address'], 0) + int(u['amount'])
+            self._balances = balances
+            self._balances_src = utxos
+        return self._balances.get(address, 0)
         
     def get_utxos(self, address: str) -> List[Dict]:
         """Lấy danh sách UTXO của một địa chỉ."""
         utxos = self.read()
         return [u for u in utxos if u['address'] == address]
+    
+    def get_utxo_map(self) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        """
+        UTXO set theo format của TransactionVerifier:
+        {tx_id: {index: {'amount', 'script_pubkey'}}}
+        
+        Map được dựng lại chỉ khi UTXO set thay đổi; caller không được
+        sửa đổi kết quả trả về.
+        """
+        utxos = self.read()
+        if self._utxo_map_src is not utxos:
+            utxo_map: Dict[str, Dict[int, Dict[str, Any]]] = {}
+            for u in utxos:
+                utxo_map.setdefault(u['tx_id'], {})[int(u['index'])] = {
+                    'amount': int(u['amount']),
+                    'script_pubkey': u['script']
+                }
+            self._utxo_map = utxo_map
+            self._utxo_map_src = utxos
+        return self._utxo_map
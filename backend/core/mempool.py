@@ -152,6 +152,10 @@ class Mempool:
         # 6. Tính size (approximate)
         tx_size = self._estimate_size(tx)
         
+        # Serialize + hash ngay lúc nhận tx (Tx cache lại), để lúc đóng block
+        # Tx.batch_ids() chỉ còn đọc TXID đã tính sẵn
+        tx.id()
+        
         # 7. Lưu transaction
         self.transactions[txid] = {
             'tx': tx,
@@ -219,6 +223,7 @@ class Mempool:
         
         Transactions được sắp xếp theo fee rate (cao → thấp) để maximize
         miner revenue. Chỉ lấy đủ transactions vừa với block size limit.
+        serialize()/id() của các tx này đã được tính sẵn từ add_transaction().
         
         Algorithm:
         1. Cleanup expired transactions
@@ -350,7 +355,7 @@ class Mempool:
             input_sum += utxo['amount']
         
         # Tính tổng outputs
-        output_sum = sum(tx_out.amount for tx_out in tx.tx_outs)
+        output_sum = tx.total_output_amount()
         
         # Fee = inputs - outputs
         fee = input_sum - output_sum
@@ -11,11 +11,21 @@ Các kiểm tra bao gồm:
 3. Tổng inputs >= tổng outputs (fee >= 0)
 4. Signatures hợp lệ
 """
+import os
 import hashlib
 import logging
-from typing import Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
 
-from ecdsa import VerifyingKey, SECP256k1, BadSignatureError
+try:
+    # libsecp256k1 (C) - nhanh hơn ~100x so với ecdsa thuần Python
+    import coincurve
+    from coincurve.ecdsa import cdata_to_der, deserialize_compact
+except ImportError:
+    coincurve = None
+    from ecdsa import VerifyingKey, SECP256k1, BadSignatureError
 
 from .Tx import Tx, TxIn, TxOut, Script
 from util.util import hash160
@@ -36,6 +46,130 @@ logger = logging.getLogger(__name__)
 UTXOSet = Dict[str, Dict[int, Dict[str, Any]]]
 
 
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Số chữ ký tối thiểu để verify song song qua process pool
+PARALLEL_VERIFY_MIN_INPUTS = 4
+
+# Số entry tối đa của signature cache (LRU)
+SIGCACHE_MAX_ENTRIES = 100000
+
+# Order của curve secp256k1 (dùng để chuẩn hóa low-S)
+SECP256K1_ORDER = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+
+# =============================================================================
+# SIGNATURE VERIFICATION (process pool)
+# =============================================================================
+
+# Process pool dùng chung, tạo lazily khi có transaction nhiều inputs
+_VERIFY_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def _get_verify_pool() -> ProcessPoolExecutor:
+    """Lấy (hoặc tạo) process pool dùng để verify chữ ký."""
+    global _VERIFY_POOL
+    if _VERIFY_POOL is None:
+        _VERIFY_POOL = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _VERIFY_POOL
+
+
+def _verify_signature(z: bytes, pubkey_bytes: bytes, sig_bytes: bytes) -> bool:
+    """
+    Verify một chữ ký ECDSA trên sighash đã tính sẵn.
+    
+    Là hàm module-level để có thể pickle sang worker process.
+    
+    Args:
+        z: Signature hash (32 bytes)
+        pubkey_bytes: Public key
+        sig_bytes: Chữ ký
+        
+    Returns:
+        bool: True nếu chữ ký hợp lệ
+    """
+    try:
+        if coincurve is not None:
+            return _verify_signature_secp256k1(z, pubkey_bytes, sig_bytes)
+        vk = VerifyingKey.from_string(pubkey_bytes, curve=SECP256k1)
+        return vk.verify(sig_bytes, z, hashfunc=hashlib.sha256)
+    except Exception as e:
+        logger.warning(f"Signature verification failed: {e}")
+        return False
+
+
+def _verify_signature_secp256k1(z: bytes, pubkey_bytes: bytes, sig_bytes: bytes) -> bool:
+    """
+    Verify bằng coincurve, cùng ngữ nghĩa với nhánh ecdsa.
+    
+    Chữ ký là r || s (64 bytes) trên SHA256(z). libsecp256k1 chỉ chấp nhận
+    low-S nên s được chuẩn hóa trước (ecdsa chấp nhận cả hai dạng).
+    """
+    if len(sig_bytes) != 64:
+        raise ValueError(f"Invalid signature length: {len(sig_bytes)}")
+    
+    # ecdsa chấp nhận raw public key x || y (64 bytes), coincurve cần prefix
+    if len(pubkey_bytes) == 64:
+        pubkey_bytes = b'\x04' + pubkey_bytes
+    
+    s = int.from_bytes(sig_bytes[32:], 'big')
+    if s > SECP256K1_ORDER // 2:
+        s = SECP256K1_ORDER - s
+    der_sig = cdata_to_der(deserialize_compact(sig_bytes[:32] + s.to_bytes(32, 'big')))
+    
+    # hasher mặc định của coincurve là SHA256, giống hashfunc của nhánh ecdsa
+    return coincurve.PublicKey(pubkey_bytes).verify(der_sig, z)
+
+
+# =============================================================================
+# SIGNATURE CACHE
+# =============================================================================
+
+# Các chữ ký đã verify thành công (mempool -> block không phải verify lại).
+# Key = SHA256(sighash || pubkey || sig)[:16], LRU theo thứ tự truy cập.
+_SIG_CACHE: 'OrderedDict[bytes, None]' = OrderedDict()
+_SIG_CACHE_LOCK = threading.Lock()
+
+
+def _sigcache_key(triple: Tuple[bytes, bytes, bytes]) -> bytes:
+    """Key của bộ ba (sighash, pubkey, signature) trong signature cache."""
+    z, pubkey_bytes, sig_bytes = triple
+    return hashlib.sha256(z + pubkey_bytes + sig_bytes).digest()[:16]
+
+
+def _sigcache_contains(triple: Tuple[bytes, bytes, bytes]) -> bool:
+    """Chữ ký đã được verify thành công trước đó chưa."""
+    key = _sigcache_key(triple)
+    with _SIG_CACHE_LOCK:
+        if key in _SIG_CACHE:
+            _SIG_CACHE.move_to_end(key)
+            return True
+    return False
+
+
+def _sigcache_add(triple: Tuple[bytes, bytes, bytes]) -> None:
+    """Ghi nhận chữ ký hợp lệ, bỏ entry cũ nhất khi vượt giới hạn."""
+    key = _sigcache_key(triple)
+    with _SIG_CACHE_LOCK:
+        _SIG_CACHE[key] = None
+        _SIG_CACHE.move_to_end(key)
+        if len(_SIG_CACHE) > SIGCACHE_MAX_ENTRIES:
+            _SIG_CACHE.popitem(last=False)
+
+
+def _verify_signature_cached(z: bytes, pubkey_bytes: bytes, sig_bytes: bytes) -> bool:
+    """_verify_signature có tra / ghi signature cache (chỉ dùng ở process chính)."""
+    triple = (z, pubkey_bytes, sig_bytes)
+    if _sigcache_contains(triple):
+        return True
+    if not _verify_signature(z, pubkey_bytes, sig_bytes):
+        return False
+    _sigcache_add(triple)
+    return True
+
+
 # =============================================================================
 # TRANSACTION VERIFIER CLASS
 # =============================================================================
@@ -47,6 +181,8 @@ class TransactionVerifier:
     Class này chứa các static methods để verify:
     - verify_transaction(): Verify transaction thông thường
     - verify_input(): Verify một input cụ thể
+    - verify_inputs_parallel(): Verify tất cả inputs (ECDSA song song)
+    - verify_transactions(): Verify một batch transactions (fail-fast)
     - verify_coinbase(): Verify coinbase transaction
     
     Tất cả methods trả về bool để dễ sử dụng trong conditions.
@@ -92,42 +228,20 @@ class TransactionVerifier:
         # =====================================================================
         
         if not tx.is_coinbase():
-            for i, tx_in in enumerate(tx.tx_ins):
-                if not TransactionVerifier.verify_input(tx, i, utxo_set):
-                    logger.debug(f"Input {i} verification failed")
-                    return False
+            if not TransactionVerifier.verify_inputs_parallel(tx, utxo_set):
+                return False
         
         # =====================================================================
         # Step 3: Check Amounts (inputs >= outputs)
         # =====================================================================
         
         if not tx.is_coinbase():
-            # Tính tổng inputs
-            input_sum = 0
-            for tx_in in tx.tx_ins:
-                prev_tx_id = tx_in.prev_tx
-                prev_index = tx_in.prev_index
-                
-                # Input phải tồn tại trong UTXO set
-                if prev_tx_id not in utxo_set:
-                    logger.debug(f"Previous tx {prev_tx_id[:16]}... not in UTXO set")
-                    return False
-                
-                if prev_index not in utxo_set[prev_tx_id]:
-                    logger.debug(f"Output {prev_index} not in UTXO set")
-                    return False
-                
-                input_sum += utxo_set[prev_tx_id][prev_index]['amount']
-            
-            # Tính tổng outputs
-            output_sum = sum(tx_out.amount for tx_out in tx.tx_outs)
-            
-            # Fee = inputs - outputs >= 0
-            if input_sum < output_sum:
-                logger.debug(f"Insufficient inputs: {input_sum} < {output_sum}")
+            if not TransactionVerifier._check_amounts(tx, utxo_set):
                 return False
         
-        logger.debug(f"Transaction {tx.id()[:16]}... verified successfully")
+        # tx.id() phải serialize + double SHA256 toàn bộ tx -> chỉ tính khi log DEBUG bật
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Transaction {tx.id()[:16]}... verified successfully")
         return True
     
     @staticmethod
@@ -148,6 +262,175 @@ class TransactionVerifier:
         Returns:
             bool: True nếu input hợp lệ
         """
+        prepared = TransactionVerifier._prepare_input(tx, input_index, utxo_set)
+        if isinstance(prepared, bool):
+            return prepared
+        return _verify_signature_cached(*prepared)
+    
+    @staticmethod
+    def verify_inputs_parallel(tx: Tx, utxo_set: UTXOSet) -> bool:
+        """
+        Xác thực tất cả inputs, chạy ECDSA verify song song.
+        
+        Các kiểm tra rẻ (UTXO, script, pubkey hash) và sighash được tính
+        trên process hiện tại; chỉ bộ ba (sighash, pubkey, signature) được
+        gửi sang process pool. Dừng ngay khi gặp signature sai.
+        
+        Với ít hơn PARALLEL_VERIFY_MIN_INPUTS chữ ký, verify tuần tự
+        (chi phí pickle/IPC lớn hơn lợi ích). Chữ ký đã có trong
+        signature cache được bỏ qua.
+        
+        Args:
+            tx: Transaction cần verify
+            utxo_set: UTXO set
+            
+        Returns:
+            bool: True nếu tất cả inputs hợp lệ
+        """
+        triples = []
+        for i in range(len(tx.tx_ins)):
+            prepared = TransactionVerifier._prepare_input(tx, i, utxo_set)
+            if prepared is False:
+                logger.debug(f"Input {i} verification failed")
+                return False
+            if prepared is not True:
+                triples.append(prepared)
+        
+        # Bỏ qua các chữ ký đã verify trước đó (signature cache)
+        triples = [t for t in triples if not _sigcache_contains(t)]
+        
+        if len(triples) < PARALLEL_VERIFY_MIN_INPUTS:
+            return all(_verify_signature_cached(*triple) for triple in triples)
+        
+        futures = {_get_verify_pool().submit(_verify_signature, *t): t for t in triples}
+        try:
+            for future in as_completed(futures):
+                if not future.result():
+                    logger.debug("Signature verification failed")
+                    return False
+                _sigcache_add(futures[future])
+        finally:
+            for future in futures:
+                future.cancel()
+        return True
+    
+    @staticmethod
+    def verify_transactions(txs: List[Tx], utxo_set: UTXOSet) -> Tuple[bool, Optional[int]]:
+        """
+        Xác thực một batch transactions (vd. khi nhận block), fail-fast.
+        
+        Các kiểm tra rẻ (structure, UTXO, amounts, sighash) chạy tuần tự;
+        chữ ký của tất cả transactions được gom lại và verify song song
+        trên cùng process pool, dừng ngay ở chữ ký sai đầu tiên.
+        
+        Mỗi outpoint (prev_tx, prev_index) chỉ được chi tiêu một lần trong
+        cả batch (chống double-spend trong cùng một tx hoặc giữa các tx).
+        
+        Args:
+            txs: Danh sách transactions
+            utxo_set: UTXO set
+            
+        Returns:
+            tuple: (True, None) nếu tất cả hợp lệ,
+                   (False, index) với index của transaction không hợp lệ
+        """
+        # (tx_index, (sighash, pubkey, signature))
+        pending: List[Tuple[int, Tuple[bytes, bytes, bytes]]] = []
+        # Các outpoint (prev_tx, prev_index) đã bị chi tiêu trong batch
+        spent: Set[Tuple[str, int]] = set()
+        
+        for tx_index, tx in enumerate(txs):
+            if not tx.tx_ins or (not tx.is_coinbase() and not tx.tx_outs):
+                logger.debug(f"Transaction #{tx_index} has invalid structure")
+                return False, tx_index
+            
+            if tx.is_coinbase():
+                continue
+            
+            for tx_in in tx.tx_ins:
+                outpoint = (tx_in.prev_tx, tx_in.prev_index)
+                if outpoint in spent:
+                    logger.debug(f"Transaction #{tx_index} double-spends {outpoint[0][:16]}...:{outpoint[1]}")
+                    return False, tx_index
+                spent.add(outpoint)
+            
+            if not TransactionVerifier._check_amounts(tx, utxo_set):
+                return False, tx_index
+            
+            for i in range(len(tx.tx_ins)):
+                prepared = TransactionVerifier._prepare_input(tx, i, utxo_set)
+                if prepared is False:
+                    logger.debug(f"Transaction #{tx_index} input {i} verification failed")
+                    return False, tx_index
+                if prepared is not True:
+                    pending.append((tx_index, prepared))
+        
+        # Bỏ qua các chữ ký đã verify trước đó (signature cache)
+        pending = [(tx_index, t) for tx_index, t in pending if not _sigcache_contains(t)]
+        
+        if len(pending) < PARALLEL_VERIFY_MIN_INPUTS:
+            for tx_index, triple in pending:
+                if not _verify_signature_cached(*triple):
+                    return False, tx_index
+            return True, None
+        
+        pool = _get_verify_pool()
+        futures = {pool.submit(_verify_signature, *triple): (tx_index, triple) for tx_index, triple in pending}
+        try:
+            for future in as_completed(futures):
+                tx_index, triple = futures[future]
+                if not future.result():
+                    logger.debug(f"Transaction #{tx_index} signature verification failed")
+                    return False, tx_index
+                _sigcache_add(triple)
+        finally:
+            for future in futures:
+                future.cancel()
+        return True, None
+    
+    @staticmethod
+    def _check_amounts(tx: Tx, utxo_set: UTXOSet) -> bool:
+        """Kiểm tra inputs tồn tại trong UTXO set và tổng inputs >= tổng outputs."""
+        # Tính tổng inputs
+        input_sum = 0
+        for tx_in in tx.tx_ins:
+            prev_tx_id = tx_in.prev_tx
+            prev_index = tx_in.prev_index
+            
+            # Input phải tồn tại trong UTXO set
+            if prev_tx_id not in utxo_set:
+                logger.debug(f"Previous tx {prev_tx_id[:16]}... not in UTXO set")
+                return False
+            
+            if prev_index not in utxo_set[prev_tx_id]:
+                logger.debug(f"Output {prev_index} not in UTXO set")
+                return False
+            
+            input_sum += utxo_set[prev_tx_id][prev_index]['amount']
+        
+        # Tính tổng outputs
+        output_sum = tx.total_output_amount()
+        
+        # Fee = inputs - outputs >= 0
+        if input_sum < output_sum:
+            logger.debug(f"Insufficient inputs: {input_sum} < {output_sum}")
+            return False
+        
+        return True
+    
+    @staticmethod
+    def _prepare_input(
+        tx: Tx, 
+        input_index: int, 
+        utxo_set: UTXOSet
+    ) -> Union[bool, Tuple[bytes, bytes, bytes]]:
+        """
+        Thực hiện các kiểm tra rẻ của một input và tính sighash.
+        
+        Returns:
+            bool nếu đã có kết luận mà không cần verify chữ ký,
+            hoặc tuple (sighash, pubkey_bytes, sig_bytes) cần verify ECDSA.
+        """
         tx_in = tx.tx_ins[input_index]
         prev_tx_id = tx_in.prev_tx
         prev_index = tx_in.prev_index
@@ -180,7 +463,7 @@ class TransactionVerifier:
             return True
         
         # =====================================================================
-        # Check 3: Signature Verification
+        # Check 3: Pubkey Hash + Signature Hash
         # =====================================================================
         
         # Bitcoin P2PKH logic:
@@ -215,13 +498,9 @@ class TransactionVerifier:
             spk_obj = Script(script_pubkey)
             z = tx.sig_hash(input_index, spk_obj)
             
-            # 4. Verify ECDSA signature
-            vk = VerifyingKey.from_string(pubkey_bytes, curve=SECP256k1)
-            sig_bytes = bytes.fromhex(sig_hex)
+            return z, pubkey_bytes, bytes.fromhex(sig_hex)
             
-            return vk.verify(sig_bytes, z, hashfunc=hashlib.sha256)
-            
-        except (ValueError, BadSignatureError, Exception) as e:
+        except Exception as e:
             logger.warning(f"Signature verification failed: {e}")
             return False
     
@@ -308,6 +587,13 @@ def verify_transaction(tx: Tx, utxo_set: UTXOSet) -> bool:
     return TransactionVerifier.verify_transaction(tx, utxo_set)
 
 
+def verify_transactions(txs: List[Tx], utxo_set: UTXOSet) -> Tuple[bool, Optional[int]]:
+    """
+    Wrapper function gọi TransactionVerifier.verify_transactions.
+    """
+    return TransactionVerifier.verify_transactions(txs, utxo_set)
+
+
 def verify_coinbase(tx: Tx, block_height: int) -> bool:
     """
     Wrapper function gọi TransactionVerifier.verify_coinbase.
@@ -8,6 +8,7 @@ Transaction Utilities (tx_utils):
 - create_p2pkh_script(): Tạo P2PKH locking script
 - sign_transaction(): Ký transaction input
 - verify_transaction(): Verify signatures
+- verify_transactions(): Verify một batch transactions (fail-fast)
 - create_signed_transaction(): Tạo và ký transaction
 - debug_print_transaction(): Print transaction details
 
@@ -38,6 +39,7 @@ from .tx_utils import (
 
 from core.transaction_verifier import (
     verify_transaction,
+    verify_transactions,
 )
 
 from .block_utils import (
@@ -66,6 +68,7 @@ __all__ = [
     'create_p2pkh_script',
     'sign_transaction',
     'verify_transaction',
+    'verify_transactions',
     'create_signed_transaction',
     'debug_print_transaction',
     'DebugTransactionError',
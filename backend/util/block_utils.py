@@ -54,6 +54,22 @@ class BlockCreationError(Exception):
     pass
 
 
+# =============================================================================
+# SIZE ACCOUNTING
+# =============================================================================
+
+def _tx_json_size(tx: Any) -> int:
+    """
+    Kích thước một tx tính vào Blocksize: số bytes JSON compact (không space).
+    
+    Mọi tx (Tx object lẫn coinbase/genesis dạng dict) đều đo cùng một cách,
+    Blocksize = tổng kích thước các tx.
+    """
+    if isinstance(tx, Tx):
+        return len(tx.to_json_bytes())
+    return len(json.dumps(tx, separators=(',', ':'), default=str).encode('utf-8'))
+
+
 # =============================================================================
 # BLOCK BUILDER CLASS
 # =============================================================================
@@ -128,7 +144,7 @@ class BlockBuilder:
             raise BlockCreationError("Coinbase transaction not set")
         
         tx_hashes = [self.coinbase_tx['txid']]
-        tx_hashes.extend(tx.id() for tx in self.transactions)
+        tx_hashes.extend(Tx.batch_ids(self.transactions))
         
         merkle_root = calculate_merkle_root(tx_hashes)
         
@@ -139,8 +155,9 @@ class BlockBuilder:
             bits=self.difficulty_bits
         )
         
-        all_txs = [self.coinbase_tx] + [tx.to_dict() for tx in self.transactions]
-        block_size = len(json.dumps(all_txs, default=str).encode('utf-8'))
+        # Tx objects giữ nguyên trong block, chỉ encode để tính kích thước
+        all_txs = [self.coinbase_tx] + self.transactions
+        block_size = sum(_tx_json_size(tx) for tx in all_txs)
         
         return Block(
             Height=height,
@@ -171,7 +188,7 @@ def create_genesis_block(
         bits=DEFAULT_DIFFICULTY
     )
     
-    block_size = len(json.dumps([coinbase_tx], default=str))
+    block_size = _tx_json_size(coinbase_tx)
     
     return Block(
         Height=0,
@@ -203,9 +220,9 @@ def add_transactions_to_block(
             if not verify_transaction(tx, utxo_set):
                 continue
             
-            block.Txs.append(tx.to_dict())
+            block.Txs.append(tx)
             block.Txcount += 1
-            block.Blocksize += len(json.dumps(tx.to_dict(), default=str))
+            block.Blocksize += _tx_json_size(tx)
             added_txs.append(tx)
             
             _update_utxo_set(tx, utxo_set)
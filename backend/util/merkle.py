@@ -22,6 +22,8 @@ Function chính:
 import hashlib
 from typing import List, Optional
 
+from .util import hash256
+
 
 # =============================================================================
 # HELPER FUNCTIONS
@@ -46,6 +48,20 @@ def double_sha256(data: bytes) -> bytes:
     return hashlib.sha256(hashlib.sha256(data).digest()).digest()
 
 
+def _hash_level(level: bytes, count: int) -> bytes:
+    """
+    Hash một tầng của cây thành tầng kế tiếp.
+    
+    Tầng là một buffer liền nhau gồm `count` hash 32 bytes (count chẵn);
+    mỗi cặp được hash thẳng từ memoryview 64 bytes, không tạo bytes ghép
+    riêng cho từng cặp.
+    """
+    mv = memoryview(level)
+    next_level = b''.join([hash256(mv[i:i + 64]) for i in range(0, count * 32, 64)])
+    mv.release()
+    return next_level
+
+
 # =============================================================================
 # MERKLE ROOT CALCULATION
 # =============================================================================
@@ -74,27 +90,24 @@ def calculate_merkle_root(tx_hashes: List[str]) -> str:
     if not tx_hashes:
         return ""
     
-    # Chuyển đổi sang bytes (little-endian theo Bitcoin format)
-    hashes = [bytes.fromhex(h)[::-1] for h in tx_hashes]
+    # Chuyển đổi sang bytes (little-endian theo Bitcoin format), cả tầng
+    # nằm trong một buffer liền nhau
+    level = b''.join([bytes.fromhex(h)[::-1] for h in tx_hashes])
+    count = len(tx_hashes)
     
     # Build tree từ dưới lên
-    while len(hashes) > 1:
+    while count > 1:
         # Duplicate hash cuối nếu số lượng lẻ
-        if len(hashes) % 2 != 0:
-            hashes.append(hashes[-1])
-        
-        # Hash từng cặp
-        new_level: List[bytes] = []
-        for i in range(0, len(hashes), 2):
-            # Ghép 2 hash liền kề và double-hash
-            combined = hashes[i] + hashes[i + 1]
-            new_hash = double_sha256(combined)
-            new_level.append(new_hash)
+        if count % 2 != 0:
+            level += level[-32:]
+            count += 1
         
-        hashes = new_level
+        # Hash từng cặp của cả tầng
+        level = _hash_level(level, count)
+        count //= 2
     
     # Trả về dạng hex (big-endian để hiển thị)
-    return hashes[0][::-1].hex() if hashes else ""
+    return level[::-1].hex()
 
 
 # =============================================================================
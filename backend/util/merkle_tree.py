@@ -1,7 +1,36 @@
-import hashlib
 import math
 from typing import List
 
+from .util import hash256
+from .merkle import _hash_level
+
+
+def merkle_root(data_list: List[str]) -> str:
+    """
+    Tính merkle root (cùng kết quả với MerkleTree(data_list).get_root())
+    mà không giữ lại các tầng của cây.
+    
+    Mỗi tầng là một buffer bytes liền nhau (mỗi cặp = 64 bytes): leaves chỉ
+    decode hex một lần, các cặp được hash bằng util.merkle._hash_level,
+    không tạo chuỗi hex trung gian cho từng node.
+    """
+    if not data_list:
+        return '0' * 64
+    
+    level = bytes.fromhex(''.join(data_list))
+    count = len(data_list)
+    while True:
+        # Số node lẻ -> nhân đôi node cuối
+        if count % 2 != 0:
+            level += level[-32:]
+            count += 1
+        
+        level = _hash_level(level, count)
+        count //= 2
+        if count == 1:
+            return level.hex()
+
+
 class MerkleTree:
     def __init__(self, data_list: List[str]):
         self.leaves = data_list
@@ -27,7 +56,7 @@ class MerkleTree:
                 right = current_layer[i+1]
                 # Double SHA256 matches Bitcoin standard
                 combined = left + right
-                hash_val = hashlib.sha256(hashlib.sha256(bytes.fromhex(combined)).digest()).digest().hex()
+                hash_val = hash256(bytes.fromhex(combined)).hex()
                 next_layer.append(hash_val)
             
             # Prepare for next level
@@ -79,6 +108,6 @@ class MerkleTree:
             else:
                 combined = current_hash + sibling
                 
-            current_hash = hashlib.sha256(hashlib.sha256(bytes.fromhex(combined)).digest()).digest().hex()
+            current_hash = hash256(bytes.fromhex(combined)).hex()
             
         return current_hash == root
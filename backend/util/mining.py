@@ -0,0 +1,325 @@
+"""
+Mining Kernel Module - Vòng lặp tìm nonce biên dịch bằng Numba
+
+Vòng lặp mining trong CPython tốn overhead interpreter lớn hơn nhiều so với
+bản thân phép hash. Module này viết lại vòng lặp tìm nonce + double SHA-256
+(64 rounds) bằng số nguyên thuần để Numba @njit biên dịch ra mã máy.
+
+- HAS_NUMBA: True nếu có numba + numpy (kernel được biên dịch)
+- mine_range(): Tìm nonce trong [start, end) cho header prefix 76 bytes
+- mine_range_parallel(): Như mine_range nhưng chia khoảng nonce cho các
+  thread của Numba (prange), không cần multiprocessing
+
+Không có numba thì các hàm vẫn chạy được dưới dạng Python thuần (dùng để
+kiểm tra), nhưng BlockHeader.mine() sẽ dùng vòng lặp hashlib thay vì kernel.
+"""
+import struct
+from typing import Optional
+
+try:
+    import numpy as np
+    from numba import njit, prange, get_num_threads
+    HAS_NUMBA = True
+except ImportError:
+    np = None
+    njit = None
+    prange = range
+    get_num_threads = None
+    HAS_NUMBA = False
+
+
+def _identity(func):
+    """Decorator rỗng khi không có numba."""
+    return func
+
+
+# cache=True: lưu mã đã biên dịch xuống đĩa, tránh compile lại mỗi lần chạy
+_jit = njit(cache=True) if HAS_NUMBA else _identity
+# parallel=True: prange được chia cho các thread (không giữ GIL)
+_pjit = njit(cache=True, parallel=True) if HAS_NUMBA else _identity
+
+
+# =============================================================================
+# SHA-256 CONSTANTS
+# =============================================================================
+
+_MASK = 0xffffffff
+
+_K = (
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+)
+
+_H0 = (
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
+    0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+)
+
+# Header 80 bytes = 640 bits, hash lần 1 = 32 bytes = 256 bits (độ dài trong padding)
+_HEADER_BITS = 640
+_DIGEST_BITS = 256
+
+# Header prefix (76 bytes) đọc thành 19 word big-endian như SHA-256
+_PREFIX_WORDS = struct.Struct('>19I')
+
+# Mỗi thread kiểm tra cờ "đã tìm thấy" sau mỗi chừng này nonce
+_STOP_CHECK_INTERVAL = 1 << 16
+
+
+# =============================================================================
+# KERNEL
+# =============================================================================
+
+@_jit
+def _bswap32(x):
+    """Đảo thứ tự byte của word 32-bit."""
+    return (
+        ((x & 0xff) << 24) | (((x >> 8) & 0xff) << 16) |
+        (((x >> 16) & 0xff) << 8) | ((x >> 24) & 0xff)
+    )
+
+
+@_jit
+def _compress(state, off, w):
+    """
+    Một lần nén SHA-256: state[off:off+8] += compress(state, w[0:16]).
+
+    Mọi phép tính làm trên int 64-bit rồi mask về 32-bit, nên cùng code
+    chạy được cả dưới Numba lẫn Python thuần.
+
+    Args:
+        state: Mảng chứa state (8 word bắt đầu tại off), được cập nhật tại chỗ
+        off: Vị trí state trong mảng
+        w: Mảng 64 word, w[0:16] là message block (giữ nguyên);
+           w[16:64] bị ghi đè
+    """
+    for t in range(16, 64):
+        x = w[t - 15]
+        y = w[t - 2]
+        s0 = (((x >> 7) | (x << 25)) ^ ((x >> 18) | (x << 14)) ^ (x >> 3)) & _MASK
+        s1 = (((y >> 17) | (y << 15)) ^ ((y >> 19) | (y << 13)) ^ (y >> 10)) & _MASK
+        w[t] = (w[t - 16] + s0 + w[t - 7] + s1) & _MASK
+
+    a = state[off]
+    b = state[off + 1]
+    c = state[off + 2]
+    d = state[off + 3]
+    e = state[off + 4]
+    f = state[off + 5]
+    g = state[off + 6]
+    h = state[off + 7]
+
+    for t in range(64):
+        S1 = (((e >> 6) | (e << 26)) ^ ((e >> 11) | (e << 21)) ^ ((e >> 25) | (e << 7))) & _MASK
+        ch = (e & f) ^ ((~e) & g)
+        t1 = (h + S1 + ch + _K[t] + w[t]) & _MASK
+        S0 = (((a >> 2) | (a << 30)) ^ ((a >> 13) | (a << 19)) ^ ((a >> 22) | (a << 10))) & _MASK
+        maj = (a & b) ^ (a & c) ^ (b & c)
+        t2 = (S0 + maj) & _MASK
+        h = g
+        g = f
+        f = e
+        e = (d + t1) & _MASK
+        d = c
+        c = b
+        b = a
+        a = (t1 + t2) & _MASK
+
+    state[off] = (state[off] + a) & _MASK
+    state[off + 1] = (state[off + 1] + b) & _MASK
+    state[off + 2] = (state[off + 2] + c) & _MASK
+    state[off + 3] = (state[off + 3] + d) & _MASK
+    state[off + 4] = (state[off + 4] + e) & _MASK
+    state[off + 5] = (state[off + 5] + f) & _MASK
+    state[off + 6] = (state[off + 6] + g) & _MASK
+    state[off + 7] = (state[off + 7] + h) & _MASK
+
+
+@_jit
+def _mine_kernel(prefix, target, start, end, w, state):
+    """
+    Tìm nonce đầu tiên trong [start, end) có double SHA-256 < target.
+
+    Args:
+        prefix: 19 word big-endian của header prefix (76 bytes)
+        target: 8 word của target, word cao nhất trước
+        start, end: Khoảng nonce
+        w: Scratch 2 x 64 word (message của hash lần 1 block 2, hash lần 2)
+        state: Scratch 24 word (hash lần 1, hash lần 2, midstate)
+
+    Returns:
+        int: Nonce tìm được, hoặc -1
+    """
+    w1 = w[0]
+    w2 = w[1]
+
+    # Midstate: header[0:64] không chứa nonce -> nén một lần cho cả khoảng
+    for i in range(8):
+        state[16 + i] = _H0[i]
+    for i in range(16):
+        w1[i] = prefix[i]
+    _compress(state, 16, w1)
+
+    # _compress không ghi vào w[0:16], nên các word cố định chỉ ghi một lần:
+    # hash lần 1, block 2: header[64:76] + nonce + padding (chỉ w1[3] đổi)
+    w1[0] = prefix[16]
+    w1[1] = prefix[17]
+    w1[2] = prefix[18]
+    w1[4] = 0x80000000
+    for i in range(5, 15):
+        w1[i] = 0
+    w1[15] = _HEADER_BITS
+
+    # Hash lần 2: digest 32 bytes + padding cố định (0x80, zeros, len = 256)
+    w2[8] = 0x80000000
+    for i in range(9, 15):
+        w2[i] = 0
+    w2[15] = _DIGEST_BITS
+
+    for nonce in range(start, end):
+        # Hash lần 1, tiếp từ midstate; nonce little-endian
+        for i in range(8):
+            state[i] = state[16 + i]
+        w1[3] = _bswap32(nonce)
+        _compress(state, 0, w1)
+
+        # Hash lần 2: chỉ 8 word đầu (digest) thay đổi
+        for i in range(8):
+            w2[i] = state[i]
+            state[8 + i] = _H0[i]
+        _compress(state, 8, w2)
+
+        # So sánh hash (đọc little-endian như số 256-bit) với target,
+        # từ word cao nhất: word cao nhất của hash = bswap(state cuối)
+        for i in range(8):
+            hw = _bswap32(state[15 - i])
+            if hw < target[i]:
+                return nonce
+            if hw > target[i]:
+                break
+    return -1
+
+
+@_pjit
+def _mine_kernel_parallel(prefix, target, start, end, w, state, results, found):
+    """
+    Chia [start, end) thành len(results) đoạn liên tiếp, mỗi đoạn một lane
+    của prange. Lane nào tìm được nonce thì ghi vào results[lane] và bật
+    found[0] để các lane khác dừng ở lần kiểm tra kế tiếp.
+
+    Args:
+        prefix, target: Như _mine_kernel
+        start, end: Khoảng nonce
+        w: Scratch 2 x 64 word cho từng lane
+        state: Scratch 24 word cho từng lane
+        results: Nonce tìm được của từng lane (-1 nếu không có)
+        found: Cờ dừng dùng chung (1 phần tử)
+    """
+    lanes = len(results)
+    span = (end - start + lanes - 1) // lanes
+    for lane in prange(lanes):
+        results[lane] = -1
+        lo = start + lane * span
+        hi = min(lo + span, end)
+        while lo < hi and found[0] == 0:
+            step_end = min(lo + _STOP_CHECK_INTERVAL, hi)
+            nonce = _mine_kernel(prefix, target, lo, step_end, w[lane], state[lane])
+            if nonce >= 0:
+                results[lane] = nonce
+                found[0] = 1
+                break
+            lo = step_end
+
+
+# =============================================================================
+# PUBLIC API
+# =============================================================================
+
+def mine_range(header_prefix: bytes, target: int, start: int, end: int) -> Optional[int]:
+    """
+    Tìm nonce trong [start, end) sao cho double SHA-256 của header < target.
+
+    Args:
+        header_prefix: 76 bytes đầu của header (không gồm nonce)
+        target: Target dạng số nguyên
+        start, end: Khoảng nonce cần quét
+
+    Returns:
+        int | None: Nonce tìm được, hoặc None nếu không có
+    """
+    if start >= end:
+        return None
+    # Target >= 2^256: hash nào cũng thỏa
+    if target >> 256:
+        return start
+
+    prefix, target_words = _kernel_args(header_prefix, target)
+    if HAS_NUMBA:
+        w = np.zeros((2, 64), dtype=np.int64)
+        state = np.zeros(24, dtype=np.int64)
+    else:
+        w = [[0] * 64, [0] * 64]
+        state = [0] * 24
+
+    nonce = _mine_kernel(prefix, target_words, start, end, w, state)
+    return nonce if nonce >= 0 else None
+
+
+def mine_range_parallel(
+    header_prefix: bytes,
+    target: int,
+    start: int,
+    end: int,
+    lanes: Optional[int] = None
+) -> Optional[int]:
+    """
+    Tìm nonce trong [start, end) trên tất cả thread của Numba.
+
+    Args:
+        header_prefix: 76 bytes đầu của header (không gồm nonce)
+        target: Target dạng số nguyên
+        start, end: Khoảng nonce cần quét
+        lanes: Số đoạn chia khoảng nonce, mặc định bằng số thread Numba
+
+    Returns:
+        int | None: Nonce nhỏ nhất trong các lane tìm được, hoặc None
+    """
+    if start >= end:
+        return None
+    if target >> 256:
+        return start
+    if lanes is None:
+        lanes = get_num_threads() if HAS_NUMBA else 1
+    lanes = max(1, min(lanes, end - start))
+
+    prefix, target_words = _kernel_args(header_prefix, target)
+    if HAS_NUMBA:
+        w = np.zeros((lanes, 2, 64), dtype=np.int64)
+        state = np.zeros((lanes, 24), dtype=np.int64)
+        results = np.empty(lanes, dtype=np.int64)
+        found = np.zeros(1, dtype=np.int64)
+    else:
+        w = [[[0] * 64, [0] * 64] for _ in range(lanes)]
+        state = [[0] * 24 for _ in range(lanes)]
+        results = [-1] * lanes
+        found = [0]
+
+    _mine_kernel_parallel(prefix, target_words, start, end, w, state, results, found)
+    hits = [int(n) for n in results if n >= 0]
+    return min(hits) if hits else None
+
+
+def _kernel_args(header_prefix: bytes, target: int):
+    """Chuyển header prefix và target thành mảng word cho kernel."""
+    prefix = _PREFIX_WORDS.unpack(header_prefix)
+    target_words = tuple((target >> (32 * (7 - i))) & _MASK for i in range(8))
+    if HAS_NUMBA:
+        prefix = np.array(prefix, dtype=np.int64)
+        target_words = np.array(target_words, dtype=np.int64)
+    return prefix, target_words
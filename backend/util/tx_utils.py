@@ -365,6 +365,8 @@ def create_signed_transaction(
         # Set scriptSig
         tx.tx_ins[i].script_sig = Script([signature.hex(), pubkey])
     
+    # scriptSig đã thay đổi -> bỏ cache serialize()/id()
+    tx.invalidate_cache()
     return tx
 
 
@@ -5,6 +5,13 @@ Module chứa các hàm tiện ích crypto được sử dụng xuyên suốt co
 """
 import hashlib
 
+# openssl_sha256 gọi thẳng OpenSSL (tự chọn SHA-NI / AVX2 theo CPU),
+# bỏ qua lớp dispatch theo tên của hashlib
+try:
+    from _hashlib import openssl_sha256 as _sha256
+except ImportError:
+    _sha256 = hashlib.sha256
+
 
 def hash256(data: bytes) -> bytes:
     """
@@ -27,7 +34,7 @@ def hash256(data: bytes) -> bytes:
         >>> hash256(b"hello").hex()[:16]
         '9595c9df90075148...'
     """
-    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+    return _sha256(_sha256(data).digest()).digest()
 
 
 def hash160(data: bytes) -> bytes:
@@ -42,7 +49,7 @@ def hash160(data: bytes) -> bytes:
     Returns:
         bytes: 20-byte hash result
     """
-    sha256_hash = hashlib.sha256(data).digest()
+    sha256_hash = _sha256(data).digest()
     return hashlib.new('ripemd160', sha256_hash).digest()
 
 
@@ -56,4 +63,4 @@ def sha256(data: bytes) -> bytes:
     Returns:
         bytes: 32-byte hash result
     """
-    return hashlib.sha256(data).digest()
\ No newline at end of file
+    return _sha256(data).digest()
\ No newline at end of file
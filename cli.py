@@ -25,6 +25,15 @@ from core.mempool import mempool
 from core.Tx import Tx, TxIn, TxOut, Script
 
 
+# =============================================================================
+# SHARED DATABASE HANDLES
+# =============================================================================
+
+# Mở một lần, dùng chung cho mọi lệnh trong menu
+db = BlockchainDB()
+utxo_set = UTXOSet()
+
+
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
@@ -121,7 +130,6 @@ def check_balance():
         pause()
         return
     
-    utxo_set = UTXOSet()
     balance = utxo_set.get_balance(address)
     
     btc = balance / (10 ** 8)
@@ -234,7 +242,7 @@ def mine_block():
     print("\n⛏️  Đang khởi tạo...")
     
     try:
-        bc = Blockchain()
+        bc = Blockchain(db=db, utxo_set=utxo_set)
         last_block = bc.fetch_last_block()
         
         if last_block is None:
@@ -266,7 +274,6 @@ def view_blockchain_info():
     """Xem thông tin tổng quan blockchain."""
     print_header("THÔNG TIN BLOCKCHAIN")
     
-    db = BlockchainDB()
     blocks = db.read()
     
     if not blocks:
@@ -303,7 +310,6 @@ def view_block_by_height():
         pause()
         return
     
-    db = BlockchainDB()
     blocks = db.read()
     
     if height < 0 or height >= len(blocks):
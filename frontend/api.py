@@ -10,29 +10,217 @@ import sys
 import os
 import time
 import json
+import uuid
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import wraps
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 # Add backend to path
 backend_path = Path(__file__).parent.parent / 'backend'
 sys.path.insert(0, str(backend_path))
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 from client.account import Account, generate_account
 from core.blockchain import Blockchain
 from core.database.database import BlockchainDB, UTXOSet
 from core.mempool import mempool
 from core.Tx import Tx, TxIn, TxOut, Script
+from core.transaction_verifier import verify_transactions
 
 # =============================================================================
 # FLASK APP SETUP
 # =============================================================================
 
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider dùng orjson (C encoder, serialize thẳng ra bytes).
+    
+    Fallback về DefaultJSONProvider (stdlib json) nếu orjson chưa cài.
+    """
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Bỏ qua bước decode bytes -> str của dumps()
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS),
+            mimetype=self.mimetype
+        )
+
+
+def _latest_block_hash() -> str:
+    """Hash của block mới nhất ('' nếu chain rỗng)."""
+    blocks = db.read()
+    if not blocks:
+        return ''
+    return blocks[-1].get('Blockheader', {}).get('blockhash', '')
+
+
+def _not_modified(etag: str) -> Response:
+    """Response 304 (client đã có bản mới nhất)."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def _cacheable(response: Response, etag: str, max_age: int = 3600) -> Response:
+    """Gắn ETag + Cache-Control cho dữ liệu bất biến (block / tx đã xác nhận)."""
+    if etag:
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response
+
+
+def _request_payload():
+    """Đọc body: msgpack nếu Content-Type là application/msgpack, ngược lại JSON."""
+    if request.mimetype == MSGPACK_MIMETYPE and msgpack is not None:
+        try:
+            return msgpack.unpackb(request.get_data(), raw=False, strict_map_key=False)
+        except Exception:
+            return None
+    return request.get_json(silent=True)
+
+
+def _negotiated(payload, status: int) -> Response:
+    """Trả payload dạng msgpack nếu client ưu tiên, ngược lại JSON."""
+    if msgpack is not None and request.accept_mimetypes.best_match(
+            ['application/json', MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE:
+        return Response(msgpack.packb(payload, use_bin_type=True), status=status, mimetype=MSGPACK_MIMETYPE)
+    response = jsonify(payload)
+    response.status_code = status
+    return response
+
+
+def _dumps_bytes(obj) -> bytes:
+    """Serialize obj thành JSON bytes (orjson nếu có)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
 app = Flask(__name__, static_folder='.', static_url_path='')
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 CORS(app)  # Cho phép cross-origin requests
 
 
+# =============================================================================
+# SHARED DATABASE HANDLES
+# =============================================================================
+
+# Dùng chung cho mọi request: giữ read cache / index giữa các request
+# thay vì mở và parse lại file mỗi lần. Cache tự load lại khi file bị
+# process khác (CLI, miner) ghi (xem BaseDB.read).
+db = BlockchainDB()
+utxo_set = UTXOSet()
+_blockchain: Optional[Blockchain] = None
+
+
+def get_blockchain() -> Blockchain:
+    """Blockchain singleton, ghi qua cùng db/utxo_set với các endpoint đọc."""
+    global _blockchain
+    if _blockchain is None:
+        _blockchain = Blockchain(db=db, utxo_set=utxo_set)
+    return _blockchain
+
+
+# =============================================================================
+# RATE LIMITING
+# =============================================================================
+
+class TokenBucketLimiter:
+    """
+    Token bucket theo client IP (in-process).
+    
+    Mỗi client có `capacity` token, hồi `rate` token/giây; mỗi request
+    tốn 1 token. Hết token -> 429 kèm Retry-After.
+    
+    Bucket đã hồi đầy giống hệt bucket mới tạo, nên được xóa định kỳ (mỗi
+    khoảng thời gian hồi đầy) để map không lớn dần theo số IP đã gặp.
+    """
+    
+    def __init__(self, per_minute: int, burst: Optional[int] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else per_minute)
+        self._buckets: Dict[str, list] = {}  # client -> [tokens, last_refill]
+        self._lock = threading.Lock()
+        
+        # Thời gian để một bucket rỗng hồi đầy = chu kỳ dọn bucket
+        self._sweep_interval = self.capacity / self.rate
+        self._next_sweep = time.monotonic() + self._sweep_interval
+    
+    def acquire(self, client: str) -> float:
+        """Lấy 1 token. Trả về 0 nếu được phép, ngược lại số giây cần chờ."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.capacity, now]
+            
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0.0
+            bucket[0] = tokens
+            return (1 - tokens) / self.rate
+    
+    def _sweep(self, now: float) -> None:
+        """Xóa các bucket đã hồi đầy (gọi khi giữ self._lock)."""
+        full = [
+            client for client, (tokens, last) in self._buckets.items()
+            if tokens + (now - last) * self.rate >= self.capacity
+        ]
+        for client in full:
+            del self._buckets[client]
+        self._next_sweep = now + self._sweep_interval
+
+
+def rate_limit(per_minute: int, burst: Optional[int] = None):
+    """Decorator giới hạn số request/phút của một endpoint theo client IP."""
+    limiter = TokenBucketLimiter(per_minute, burst)
+    
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            retry_after = limiter.acquire(request.remote_addr or 'unknown')
+            if retry_after:
+                response = jsonify({'success': False, 'error': 'Quá nhiều request, thử lại sau'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
 # =============================================================================
 # STATIC FILES
 # =============================================================================
@@ -98,8 +286,6 @@ def import_wallet():
 def get_balance(address):
     """Lấy số dư của địa chỉ."""
     try:
-        from core.database.database import UTXOSet
-        utxo_set = UTXOSet()
         balance = utxo_set.get_balance(address)
         
         # UTXO model doesn't easily support history without an indexer
@@ -118,25 +304,129 @@ def get_balance(address):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/wallet/history/<address>', methods=['GET'])
+@rate_limit(1000)
+def get_address_history(address):
+    """
+    Lịch sử giao dịch của địa chỉ.
+    
+    Response được stream từng giao dịch (không dựng toàn bộ list/JSON
+    trong bộ nhớ), body vẫn là một JSON object hợp lệ.
+    
+    ETag đổi khi có block mới; client poll với If-None-Match nhận 304.
+    """
+    etag = hashlib.sha256((_latest_block_hash() + address).encode('utf-8')).hexdigest()[:16]
+    if etag in request.if_none_match:
+        return _not_modified(etag)
+    
+    def generate():
+        yield b'{"success":true,"data":{"address":' + _dumps_bytes(address) + b',"history":['
+        first = True
+        for row in db.iter_transactions_by_address(address):
+            yield (b'' if first else b',') + _dumps_bytes(row)
+            first = False
+        yield b']}}'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+
 # =============================================================================
 # TRANSACTION API
 # =============================================================================
 
+# Schema của /api/transaction/send: field -> (type, default, required)
+SEND_TX_SCHEMA = {
+    'recipient': (str, '', True),
+    'amount': (int, 0, True),
+    'senderAddress': (str, '', False),
+    'prevTxid': (str, '0' * 64, False),
+    'prevIndex': (int, 0, False),
+    'inputAmount': (int, None, False),
+}
+
+
+def parse_send_request(data):
+    """
+    Validate + parse body của /api/transaction/send trong một lượt.
+    
+    Returns:
+        tuple: (fields, errors) - errors là dict field -> thông báo lỗi
+    """
+    if not isinstance(data, dict):
+        return None, {'body': 'Body phải là JSON object'}
+    
+    fields = {}
+    errors = {}
+    for name, (field_type, default, required) in SEND_TX_SCHEMA.items():
+        value = data.get(name)
+        if value is None or value == '':
+            if required:
+                errors[name] = 'Thiếu trường bắt buộc'
+            fields[name] = default
+            continue
+        
+        parsed = _parse_field(value, field_type)
+        if parsed is None:
+            errors[name] = f'Phải là kiểu {field_type.__name__}'
+        else:
+            fields[name] = parsed
+    
+    for name in ('amount', 'prevIndex', 'inputAmount'):
+        if name not in errors and fields[name] is not None and fields[name] < 0:
+            errors[name] = 'Không được âm'
+    if 'amount' not in errors and fields['amount'] <= 0:
+        errors['amount'] = 'Phải lớn hơn 0'
+    if 'prevTxid' not in errors:
+        try:
+            if len(bytes.fromhex(fields['prevTxid'])) != 32:
+                raise ValueError
+        except ValueError:
+            errors['prevTxid'] = 'Phải có 64 ký tự hex'
+    
+    return fields, errors
+
+
+def _parse_field(value, field_type):
+    """
+    Kiểm tra kiểu một field (không ép kiểu tùy tiện như int(1.9) / str(dict)).
+    
+    - str: chỉ nhận string
+    - int: nhận số nguyên JSON (không nhận bool, float) hoặc string chỉ gồm
+      chữ số (form trên web gửi số dạng string)
+    
+    Returns:
+        Giá trị đã parse, hoặc None nếu sai kiểu
+    """
+    if field_type is str:
+        return value if isinstance(value, str) else None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = value.strip()
+        if value.isascii() and value.isdigit():
+            return int(value)
+    return None
+
+
 @app.route('/api/transaction/send', methods=['POST'])
+@rate_limit(100)
 def send_transaction():
     """Tạo và gửi giao dịch."""
     try:
-        data = request.get_json()
-        
-        recipient = data.get('recipient', '')
-        amount = int(data.get('amount', 0))
-        sender_address = data.get('senderAddress', '')
-        prev_txid = data.get('prevTxid', '0' * 64)
-        prev_index = int(data.get('prevIndex', 0))
-        input_amount = int(data.get('inputAmount', amount))
+        req, errors = parse_send_request(request.get_json(silent=True))
+        if errors:
+            return jsonify({'success': False, 'error': 'Thông tin không hợp lệ', 'fields': errors}), 400
         
-        if not recipient or amount <= 0:
-            return jsonify({'success': False, 'error': 'Thông tin không hợp lệ'}), 400
+        recipient = req['recipient']
+        amount = req['amount']
+        sender_address = req['senderAddress']
+        prev_txid = req['prevTxid']
+        prev_index = req['prevIndex']
+        input_amount = req['inputAmount'] if req['inputAmount'] is not None else amount
         
         # Tạo transaction
         tx_out = TxOut(
@@ -181,6 +471,55 @@ def send_transaction():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/transaction/<txid>', methods=['GET'])
+@rate_limit(1000)
+def get_transaction(txid):
+    """Lấy giao dịch đã xác nhận theo TXID (ETag = txid)."""
+    try:
+        tx = db.get_transaction_by_id(txid)
+        if tx is None:
+            return jsonify({'success': False, 'error': 'Giao dịch không tồn tại'}), 404
+        
+        response = _cacheable(jsonify({'success': True, 'data': tx}), tx['txid'])
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/transaction/verify/batch', methods=['POST'])
+@rate_limit(100)
+def verify_transactions_batch():
+    """
+    Verify nhiều giao dịch trong một request (fail-fast).
+    
+    Body: {'txs': [tx_dict, ...]} với tx_dict theo format Tx.to_dict().
+    Trả về index của giao dịch không hợp lệ đầu tiên phát hiện được.
+    
+    Hỗ trợ msgpack (Content-Type / Accept: application/msgpack) cho
+    traffic nội bộ giữa các node.
+    """
+    try:
+        data = _request_payload()
+        if not isinstance(data, dict) or not isinstance(data.get('txs'), list):
+            return _negotiated({'success': False, 'error': 'Body phải có dạng {"txs": [...]}'}, 400)
+        
+        txs = []
+        for i, tx_dict in enumerate(data['txs']):
+            try:
+                txs.append(Tx.from_dict(tx_dict))
+            except (KeyError, TypeError, ValueError) as e:
+                return _negotiated({'success': False, 'error': f'Giao dịch #{i} không hợp lệ: {e}'}, 400)
+        
+        valid, index = verify_transactions(txs, utxo_set.get_utxo_map())
+        
+        return _negotiated({
+            'success': True,
+            'data': {'valid': valid, 'index': index, 'count': len(txs)}
+        }, 200)
+    except Exception as e:
+        return _negotiated({'success': False, 'error': str(e)}, 500)
+
+
 # =============================================================================
 # BLOCKCHAIN API
 # =============================================================================
@@ -189,7 +528,6 @@ def send_transaction():
 def get_blockchain_info():
     """Lấy thông tin blockchain."""
     try:
-        db = BlockchainDB()
         blocks = db.read()
         
         if not blocks:
@@ -223,7 +561,6 @@ def get_blocks():
         limit = int(request.args.get('limit', 10))
         offset = int(request.args.get('offset', 0))
         
-        db = BlockchainDB()
         blocks = db.read()
         
         # Lấy blocks mới nhất
@@ -249,7 +586,6 @@ def get_blocks():
 def get_block(height):
     """Lấy chi tiết một block."""
     try:
-        db = BlockchainDB()
         blocks = db.read()
         
         if height < 0 or height >= len(blocks):
@@ -258,7 +594,12 @@ def get_block(height):
         block = blocks[height]
         header = block.get('Blockheader', {})
         
-        return jsonify({
+        # Block đã đào không đổi -> blockhash là ETag ổn định
+        etag = header.get('blockhash', '')
+        if etag and etag in request.if_none_match:
+            return _not_modified(etag)
+        
+        response = jsonify({
             'success': True,
             'data': {
                 'height': block.get('Height', height),
@@ -272,39 +613,146 @@ def get_block(height):
                 'transactions': block.get('Txs', [])[:5]  # Giới hạn 5 tx
             }
         })
+        return _cacheable(response, etag)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _mine_next_block() -> dict:
+    """Đào block tiếp theo (chạy trong background worker)."""
+    bc = get_blockchain()
+    last_block = bc.fetch_last_block()
+    
+    if last_block is None:
+        raise RuntimeError('Blockchain trống')
+    
+    new_height = last_block['Height'] + 1
+    prev_hash = last_block['Blockheader']['blockhash']
+    
+    start_time = time.time()
+    bc.add_block(new_height, prev_hash)
+    elapsed = time.time() - start_time
+    
+    return {
+        'height': new_height,
+        'time': round(elapsed, 2),
+        'reward': 50
+    }
+
+
 @app.route('/api/blockchain/mine', methods=['POST'])
+@rate_limit(10)
 def mine_block():
-    """Đào block mới."""
+    """
+    Đào block mới (bất đồng bộ).
+    
+    PoW là CPU-bound nên không chạy trong request handler: job được đưa vào
+    background worker và trả về 202 + jobId, client poll /api/jobs/<jobId>.
+    Đang có job đào block chờ/chạy thì trả lại job đó thay vì xếp thêm.
+    """
     try:
-        bc = Blockchain()
-        last_block = bc.fetch_last_block()
-        
-        if last_block is None:
-            return jsonify({'success': False, 'error': 'Blockchain trống'}), 500
-        
-        new_height = last_block['Height'] + 1
-        prev_hash = last_block['Blockheader']['blockhash']
-        
-        start_time = time.time()
-        bc.add_block(new_height, prev_hash)
-        elapsed = time.time() - start_time
-        
+        job_id, future = submit_job(_mine_next_block, key='mine')
         return jsonify({
             'success': True,
-            'data': {
-                'height': new_height,
-                'time': round(elapsed, 2),
-                'reward': 50
-            }
-        })
+            'data': {'jobId': job_id, 'status': _job_status(future)}
+        }), 202
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# =============================================================================
+# BACKGROUND JOBS
+# =============================================================================
+
+# Một worker: các job đào block phải chạy tuần tự (cùng ghi vào chain),
+# bản thân mining đã song song hóa bằng multiprocessing.
+_job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='api-job')
+
+# Kết quả job đã xong được giữ JOB_TTL giây; quá MAX_JOBS job thì xóa các
+# job đã xong cũ nhất trước (job chờ/chạy không bị xóa)
+JOB_TTL = 600
+MAX_JOBS = 100
+
+_jobs: Dict[str, Future] = {}
+_job_done_at: Dict[str, float] = {}  # job id -> thời điểm xong (monotonic)
+_job_keys: Dict[str, str] = {}       # key -> job id gần nhất của key đó
+_jobs_lock = threading.Lock()
+
+
+def submit_job(fn, *args, key: Optional[str] = None) -> Tuple[str, Future]:
+    """
+    Đưa job vào background worker.
+    
+    Args:
+        key: Nếu job gần nhất cùng key còn đang chờ/chạy thì trả lại job đó
+             thay vì xếp thêm job mới
+    
+    Returns:
+        tuple: (job id, Future của job)
+    """
+    with _jobs_lock:
+        _prune_jobs()
+        if key is not None:
+            job_id = _job_keys.get(key)
+            future = _jobs.get(job_id) if job_id is not None else None
+            if future is not None and not future.done():
+                return job_id, future
+        
+        job_id = uuid.uuid4().hex
+        future = _jobs[job_id] = _job_executor.submit(fn, *args)
+        if key is not None:
+            _job_keys[key] = job_id
+    
+    future.add_done_callback(lambda _, job_id=job_id: _job_done_at.__setitem__(job_id, time.monotonic()))
+    return job_id, future
+
+
+def _prune_jobs() -> None:
+    """Xóa job đã xong quá JOB_TTL, rồi job đã xong cũ nhất nếu quá MAX_JOBS (gọi khi giữ _jobs_lock)."""
+    now = time.monotonic()
+    expired = [job_id for job_id, done_at in list(_job_done_at.items()) if now - done_at > JOB_TTL]
+    overflow = len(_jobs) - len(expired) - MAX_JOBS
+    if overflow > 0:
+        remaining = sorted(
+            (done_at, job_id) for job_id, done_at in list(_job_done_at.items())
+            if now - done_at <= JOB_TTL
+        )
+        expired.extend(job_id for _, job_id in remaining[:overflow])
+    
+    for job_id in expired:
+        _jobs.pop(job_id, None)
+        _job_done_at.pop(job_id, None)
+
+
+def _job_status(future: Future) -> str:
+    """Trạng thái của job: pending / running / done / failed."""
+    if not future.done():
+        return 'running' if future.running() else 'pending'
+    return 'failed' if future.exception() is not None else 'done'
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Trạng thái / kết quả của background job."""
+    with _jobs_lock:
+        _prune_jobs()
+        future = _jobs.get(job_id)
+    if future is None:
+        return jsonify({'success': False, 'error': 'Job không tồn tại'}), 404
+    
+    if not future.done():
+        return jsonify({'success': True, 'data': {'jobId': job_id, 'status': _job_status(future)}}), 202
+    
+    error = future.exception()
+    if error is not None:
+        return jsonify({'success': False, 'data': {'jobId': job_id, 'status': 'failed'}, 'error': str(error)}), 500
+    
+    return jsonify({
+        'success': True,
+        'data': {'jobId': job_id, 'status': 'done', 'result': future.result()}
+    })
+
+
 # =============================================================================
 # MAIN
 # =============================================================================
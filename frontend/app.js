@@ -31,6 +31,19 @@ async function callAPI(endpoint, options = {}) {
     }
 }
 
+/**
+ * Poll background job cho đến khi xong
+ */
+async function waitForJob(jobId, interval = 1000) {
+    while (true) {
+        const result = await callAPI(`/jobs/${jobId}`);
+        if (!result.success || result.data.status === 'done') {
+            return result;
+        }
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+}
+
 /**
  * Hiển thị toast thông báo
  */
@@ -263,13 +276,14 @@ async function mineBlock() {
     btn.disabled = true;
     btn.innerHTML = '<span>⏳</span> Đang đào...';
 
-    const result = await callAPI('/blockchain/mine', { method: 'POST' });
+    const job = await callAPI('/blockchain/mine', { method: 'POST' });
+    const result = job.success ? await waitForJob(job.data.jobId) : job;
 
     btn.disabled = false;
     btn.innerHTML = '<span>⛏️</span> Bắt Đầu Đào';
 
     if (result.success) {
-        const data = result.data;
+        const data = result.data.result;
         document.getElementById('mine-height').textContent = `#${data.height}`;
         document.getElementById('mine-time').textContent = `${data.time}s`;
         document.getElementById('mine-reward').textContent = `${data.reward} BTC`;
@@ -10,9 +10,16 @@ echo.
 pip install bit==0.8.0
 pip install cryptography==41.0.2
 pip install ecdsa==0.18.0
+pip install coincurve
 pip install base58
+pip install based58
 pip install flask
 pip install flask-cors
+pip install orjson
+pip install msgpack
+pip install pycryptodome
+pip install numpy
+pip install numba
 
 echo.
 echo ========================================
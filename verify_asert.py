@@ -0,0 +1,38 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.blockchain import Blockchain, ASERT_HALF_LIFE, DEFAULT_DIFFICULTY, TARGET_BLOCK_TIME
+from core.blockheader import BlockHeader
+
+ANCHOR_TIMESTAMP = 1_700_000_000
+
+
+def asert_target(anchor_target: int, height: int, timestamp: int) -> int:
+    """Target ASERT cho block sau block (height, timestamp), neo tại genesis."""
+    bc = Blockchain.__new__(Blockchain)  # không cần DB: neo đặt sẵn
+    bc._asert_anchor = (0, ANCHOR_TIMESTAMP, anchor_target)
+    last_block = {'Height': height, 'Blockheader': {'timestamp': timestamp}}
+    return BlockHeader.bits_to_target(bc.calculate_asert_bits(last_block))
+
+
+def test_asert_bits():
+    anchor_target = BlockHeader.bits_to_target(DEFAULT_DIFFICULTY)
+    
+    for height in (0, 10, 100):
+        on_schedule = ANCHOR_TIMESTAMP + TARGET_BLOCK_TIME * height
+        
+        # Đúng lịch -> giữ nguyên target (1x)
+        assert asert_target(anchor_target, height, on_schedule) == anchor_target
+        # Trễ một half-life -> target x2 (dễ hơn)
+        assert asert_target(anchor_target, height, on_schedule + ASERT_HALF_LIFE) == anchor_target * 2
+        # Sớm một half-life -> target /2 (khó hơn)
+        assert asert_target(anchor_target, height, on_schedule - ASERT_HALF_LIFE) == anchor_target // 2
+    
+    print("ASERT: 1x / 2x / 0.5x OK")
+
+
+if __name__ == "__main__":
+    test_asert_bits()